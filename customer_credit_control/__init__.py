@@ -1 +1,7 @@
-from . import models
\ No newline at end of file
+from . import models
+from . import populate
+from . import report
+
+
+def post_init_hook(env):
+    env['customer.credit.exposure']._rebuild()
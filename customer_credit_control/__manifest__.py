@@ -1,16 +1,21 @@
 {
     'name': 'Customer Credit Control',
-    'version': '1.0.0',
+    'version': '1.0.1',
     'category': 'Accounting',
     'summary': 'Mijoz kredit limitini boshqarish',
     'description': 'Mijozlar uchun kredit limitini belgilash va kuzatish',
     'author': 'Your Company',
     'depends': ['account', 'sale'],
     'data': [
+        'data/ir_cron_data.xml',
         'security/ir.model.access.csv',
         'security/record_rules.xml',
         'views/credit_limit_views.xml',
+        'views/credit_exposure_views.xml',
+        'report/credit_risk_report_views.xml',
+        'views/credit_perf_sample_views.xml',
     ],
+    'post_init_hook': 'post_init_hook',
     'installable': True,
     'auto_install': False,
     'license': 'LGPL-3',
@@ -0,0 +1,3 @@
+def migrate(cr, version):
+    # Daftar kaliti valyutaga bog'landi; qatorlar post-migrate'da qayta quriladi
+    cr.execute("DELETE FROM customer_credit_exposure")
@@ -1 +1,5 @@
-from . import credit_limit
\ No newline at end of file
+from . import credit_currency
+from . import credit_perf_sample
+from . import credit_limit
+from . import credit_exposure
+from . import account_move
@@ -0,0 +1,79 @@
+from odoo import models, api
+
+
+class AccountMove(models.Model):
+    _inherit = 'account.move'
+
+    _credit_open_due_idx = models.Index(
+        "(commercial_partner_id, company_id)"
+        " WHERE state = 'posted'"
+        " AND move_type IN ('out_invoice', 'out_refund')"
+        " AND payment_state IN ('not_paid', 'partial', 'in_payment')"
+    )
+
+    def _get_credit_exposure_partners(self):
+        return self.filtered(
+            lambda m: m.move_type in ('out_invoice', 'out_refund')
+        ).commercial_partner_id
+
+    @api.model
+    def _invalidate_credit_exposure(self, partners):
+        if not partners:
+            return
+        self.env['customer.credit.exposure']._schedule_refresh(partners)
+        self.env['customer.credit.limit']._mark_total_due_dirty(partners)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        moves = super().create(vals_list)
+        self._invalidate_credit_exposure(moves._get_credit_exposure_partners())
+        return moves
+
+    def write(self, vals):
+        if not {'partner_id', 'line_ids', 'invoice_line_ids'}.intersection(vals):
+            return super().write(vals)
+        partners = self._get_credit_exposure_partners()
+        result = super().write(vals)
+        self._invalidate_credit_exposure(partners | self._get_credit_exposure_partners())
+        return result
+
+    def unlink(self):
+        partners = self._get_credit_exposure_partners()
+        result = super().unlink()
+        self._invalidate_credit_exposure(partners)
+        return result
+
+    def _post(self, soft=True):
+        posted = super()._post(soft=soft)
+        self._invalidate_credit_exposure(posted._get_credit_exposure_partners())
+        return posted
+
+    def button_draft(self):
+        result = super().button_draft()
+        self._invalidate_credit_exposure(self._get_credit_exposure_partners())
+        return result
+
+    def button_cancel(self):
+        result = super().button_cancel()
+        self._invalidate_credit_exposure(self._get_credit_exposure_partners())
+        return result
+
+
+class AccountPartialReconcile(models.Model):
+    _inherit = 'account.partial.reconcile'
+
+    def _get_credit_exposure_partners(self):
+        moves = self.debit_move_id.move_id | self.credit_move_id.move_id
+        return moves._get_credit_exposure_partners()
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        partials = super().create(vals_list)
+        self.env['account.move']._invalidate_credit_exposure(partials._get_credit_exposure_partners())
+        return partials
+
+    def unlink(self):
+        partners = self._get_credit_exposure_partners()
+        result = super().unlink()
+        self.env['account.move']._invalidate_credit_exposure(partners)
+        return result
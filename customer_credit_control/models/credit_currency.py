@@ -0,0 +1,92 @@
+from odoo import models, api
+from odoo.tools import SQL
+
+
+class CustomerCreditCurrency(models.AbstractModel):
+    _name = 'customer.credit.currency'
+    _description = 'Kredit Nazorati Valyuta Konvertatsiyasi'
+
+    def _get_rate_cache(self):
+        """(currency id, root company id, sana) -> kurs; joriy so'rov (cursor) doirasida"""
+        return self.env.cr.cache.setdefault('customer_credit_control.rates', {})
+
+    def _rate_key(self, currency_id, company_id, date):
+        return currency_id, self.env['res.company'].browse(company_id).root_id.id, date
+
+    @api.model
+    def _preload_rates(self, keys):
+        """Kerakli (valyuta, kompaniya, sana) kurslarini bitta so'rov bilan yuklash.
+
+        Tanlash tartibi ``res.currency._get_rates`` bilan bir xil: avval kompaniya
+        kursi, so'ng umumiy kurs; sanadan oldingi kurs bo'lmasa eng birinchi kurs.
+        """
+        cache = self._get_rate_cache()
+        missing = {self._rate_key(*key) for key in keys} - cache.keys()
+        if not missing:
+            return
+        self.env['res.currency.rate'].flush_model(['currency_id', 'company_id', 'name', 'rate'])
+        self.env.cr.execute(SQL(
+            """
+            SELECT k.currency_id, k.company_id, k.date,
+                   COALESCE(
+                       (SELECT r.rate
+                          FROM res_currency_rate r
+                         WHERE r.currency_id = k.currency_id
+                           AND (r.company_id IS NULL OR r.company_id = k.company_id)
+                           AND r.name <= k.date
+                      ORDER BY r.company_id, r.name DESC
+                         LIMIT 1),
+                       (SELECT r.rate
+                          FROM res_currency_rate r
+                         WHERE r.currency_id = k.currency_id
+                           AND (r.company_id IS NULL OR r.company_id = k.company_id)
+                      ORDER BY r.company_id, r.name ASC
+                         LIMIT 1),
+                       1.0
+                   )::float8
+              FROM (VALUES %s) AS k(currency_id, company_id, date)
+            """,
+            SQL(", ").join(
+                SQL("(%s, %s, %s::date)", currency_id, company_id, date)
+                for currency_id, company_id, date in missing
+            ),
+        ))
+        for currency_id, company_id, date, rate in self.env.cr.fetchall():
+            cache[currency_id, company_id, date] = rate
+
+    @api.model
+    def _get_conversion_rate(self, from_currency, to_currency, company, date):
+        if from_currency == to_currency:
+            return 1.0
+        keys = [
+            (from_currency.id, company.id, date),
+            (to_currency.id, company.id, date),
+        ]
+        self._preload_rates(keys)
+        cache = self._get_rate_cache()
+        from_rate, to_rate = (cache[self._rate_key(*key)] for key in keys)
+        return to_rate / from_rate
+
+    @api.model
+    def _convert(self, amount, from_currency, to_currency, company, date):
+        if not amount:
+            return 0.0
+        return to_currency.round(amount * self._get_conversion_rate(from_currency, to_currency, company, date))
+
+    @api.model
+    def _convert_grouped(self, amounts, to_currency):
+        """``{(valyuta id, kompaniya id, sana): summa}`` ni ``to_currency`` dagi jamiga aylantirish.
+
+        Summalar avval guruh bo'yicha qo'shiladi, har bir guruh bir marta konvertatsiya qilinadi.
+        """
+        grouped = {key: amount for key, amount in amounts.items() if amount}
+        self._preload_rates(
+            [key for key in grouped]
+            + [(to_currency.id, company_id, date) for __, company_id, date in grouped]
+        )
+        Currency = self.env['res.currency']
+        Company = self.env['res.company']
+        total = 0.0
+        for (currency_id, company_id, date), amount in grouped.items():
+            total += self._convert(amount, Currency.browse(currency_id), to_currency, Company.browse(company_id), date)
+        return total
@@ -0,0 +1,396 @@
+import logging
+import time
+from collections import defaultdict
+
+from odoo import models, fields, api
+from odoo.tools import SQL
+from odoo.tools.lru import LRU
+
+from .credit_perf_sample import instrumented
+
+_logger = logging.getLogger(__name__)
+
+LOCK_WAIT_LOG_THRESHOLD = 0.5
+
+# (dbname, partner id, currency id, sana, versiyalar) -> (posted_due, open_sales).
+# Kalitda daftar versiyalari bor, shuning uchun eskirgan yozuvlar shunchaki ishlatilmaydi.
+# Versiyalar sequence'dan olinadi va rollback'dan keyin qayta berilmaydi, shuning uchun
+# bekor qilingan tranzaksiyada keshlangan qiymat boshqa tranzaksiyaga tushmaydi.
+_SNAPSHOTS = LRU(8192)
+VERSION_SEQUENCE = 'customer_credit_exposure_version_seq'
+REFRESH_KEY = 'customer_credit_control.refresh_partner_ids'
+
+
+class CustomerCreditExposure(models.Model):
+    _name = 'customer.credit.exposure'
+    _description = 'Mijoz Kredit Riski Daftari'
+    _rec_name = 'partner_id'
+    _order = 'partner_id, company_id, currency_id'
+
+    partner_id = fields.Many2one('res.partner', string='Mijoz', required=True, readonly=True, ondelete='cascade')
+    company_id = fields.Many2one('res.company', string='Kompaniya', required=True, readonly=True, ondelete='cascade')
+    currency_id = fields.Many2one('res.currency', string='Valyuta', required=True, readonly=True,
+                                  help="Qarz kompaniya valyutasida, ochiq savdo buyurtma valyutasida saqlanadi")
+    posted_due = fields.Monetary(string='Jami Qarz', readonly=True)
+    open_sales = fields.Monetary(string='Ochiq Savdo Riski', readonly=True)
+    version = fields.Integer(string='Versiya', readonly=True, default=1)
+    invoice_count = fields.Integer(string='Ochiq Hisob-fakturalar', readonly=True)
+    order_count = fields.Integer(string='Ochiq Buyurtmalar', readonly=True)
+
+    _partner_company_unique = models.Constraint(
+        'UNIQUE(partner_id, company_id, currency_id)',
+        "Har bir mijoz, kompaniya va valyuta uchun faqat bitta risk yozuvi bo'lishi mumkin.",
+    )
+
+    def init(self):
+        self.env.cr.execute(SQL(
+            "CREATE SEQUENCE IF NOT EXISTS %s MAXVALUE 2147483647 CYCLE",
+            SQL.identifier(VERSION_SEQUENCE),
+        ))
+
+    def _next_version(self):
+        return SQL("nextval(%s)", VERSION_SEQUENCE)
+
+    @api.model
+    def _aggregate_posted_due(self, partner_ids=None):
+        """(commercial partner id, company id, kompaniya valyutasi id) -> (ochiq qarz, hisob-fakturalar soni)"""
+        domain = [
+            ('state', '=', 'posted'),
+            ('payment_state', 'in', ['not_paid', 'partial', 'in_payment']),
+            ('move_type', 'in', ['out_invoice', 'out_refund']),
+        ]
+        if partner_ids is not None:
+            domain.append(('commercial_partner_id', 'in', partner_ids))
+        groups = self.env['account.move'].sudo()._read_group(
+            domain, ['commercial_partner_id', 'company_id'], ['amount_residual_signed:sum', '__count'],
+        )
+        self.env['customer.credit.perf.sample']._add_scanned(invoice_count=sum(count for *__, count in groups))
+        return {
+            (partner.id, company.id, company.currency_id.id): (amount, count)
+            for partner, company, amount, count in groups
+        }
+
+    @api.model
+    def _open_sales_condition(self, partner_ids=None, order_ids=None):
+        """Tasdiqlangan buyurtmalarning hisob-faktura qilinmagan qatorlari uchun SQL sharti.
+
+        Sana bo'yicha cheklanmaydi: saqlangan summa vaqt o'tishi bilan eskirmasligi kerak.
+        """
+        self.env['sale.order.line'].flush_model([
+            'order_id', 'display_type', 'product_uom_qty', 'qty_invoiced', 'price_total',
+        ])
+        self.env['sale.order'].flush_model(['state', 'partner_id', 'company_id', 'currency_id', 'date_order'])
+        self.env['res.partner'].flush_model(['commercial_partner_id'])
+        conditions = [
+            SQL("so.state = 'sale'"),
+            SQL("sol.display_type IS NULL"),
+            SQL("sol.product_uom_qty > 0"),
+            SQL("sol.qty_invoiced < sol.product_uom_qty"),
+        ]
+        if partner_ids is not None:
+            conditions.append(SQL("rp.commercial_partner_id IN %s", tuple(partner_ids) or (None,)))
+        if order_ids is not None:
+            conditions.append(SQL("so.id IN %s", tuple(order_ids) or (None,)))
+        return SQL(" AND ").join(conditions)
+
+    @api.model
+    def _aggregate_open_sales(self, partner_ids=None):
+        """(commercial partner id, company id, buyurtma valyutasi id) -> (hisob-fakturasiz savdo, buyurtmalar soni)
+
+        Summa saqlangan qator miqdorlari va narxlaridan bitta guruhlangan so'rov bilan
+        buyurtma valyutasida olinadi; limit valyutasiga faqat o'qishda bir marta o'tkaziladi.
+        """
+        rows = self.env.execute_query(SQL(
+            """
+            SELECT rp.commercial_partner_id, so.company_id, so.currency_id,
+                   SUM(sol.price_total * (sol.product_uom_qty - sol.qty_invoiced) / sol.product_uom_qty)::float8,
+                   COUNT(DISTINCT so.id)
+              FROM sale_order_line sol
+              JOIN sale_order so ON so.id = sol.order_id
+              JOIN res_partner rp ON rp.id = so.partner_id
+             WHERE %s
+          GROUP BY rp.commercial_partner_id, so.company_id, so.currency_id
+            """,
+            self._open_sales_condition(partner_ids=partner_ids),
+        ))
+        self.env['customer.credit.perf.sample']._add_scanned(order_count=sum(row[4] for row in rows))
+        return {
+            (partner_id, company_id, currency_id): (amount, count)
+            for partner_id, company_id, currency_id, amount, count in rows
+        }
+
+    @api.model
+    def _get_order_date(self, order):
+        return order.date_order.date() if order.date_order else fields.Date.context_today(order)
+
+    @api.model
+    @instrumented('order_open_amounts', lambda self, orders: orders.partner_id)
+    def _get_orders_open_amounts(self, orders):
+        """order id -> buyurtma valyutasidagi hisob-fakturasiz summa"""
+        orders = orders.filtered('id')
+        if not orders:
+            return {}
+        rows = self.env.execute_query(SQL(
+            """
+            SELECT so.id,
+                   SUM(sol.price_total * (sol.product_uom_qty - sol.qty_invoiced) / sol.product_uom_qty)::float8
+              FROM sale_order_line sol
+              JOIN sale_order so ON so.id = sol.order_id
+              JOIN res_partner rp ON rp.id = so.partner_id
+             WHERE %s
+          GROUP BY so.id
+            """,
+            self._open_sales_condition(order_ids=orders.ids),
+        ))
+        self.env['customer.credit.perf.sample']._add_scanned(order_count=len(rows))
+        return dict(rows)
+
+    @api.model
+    def _get_key_partners(self, keys):
+        return self.env['res.partner'].browse({partner_id for partner_id, __ in keys})
+
+    @api.model
+    @instrumented('partner_totals', lambda self, keys, date: self._get_key_partners(keys))
+    def _get_partner_totals(self, keys, date):
+        """(commercial partner id, valyuta) -> (posted_due, open_sales) shu valyutada.
+
+        Qarz faqat mijozning o'ziniki; ochiq savdoga ``child_of`` bo'yicha sho'ba
+        korxonalarning tasdiqlangan buyurtmalari ham kiradi.
+        """
+        return self._get_hierarchy_totals(keys, date, own_due=True)
+
+    @api.model
+    @instrumented('group_totals', lambda self, keys, date: self._get_key_partners(keys))
+    def _get_group_totals(self, keys, date):
+        """(holding partner id, valyuta) -> (posted_due, open_sales) butun guruh bo'yicha"""
+        return self._get_hierarchy_totals(keys, date, own_due=False)
+
+    @api.model
+    def _subtree_query(self, partner_ids):
+        """(holding_id, partner_id) juftliklari: mijozning o'zi va barcha sho'ba korxonalari.
+
+        Har bir mijoz uchun o'zgarmas ``parent_path LIKE '1/7/%'`` prefiksi beriladi,
+        shunda PostgreSQL ``parent_path`` indeksidan foydalana oladi.
+        """
+        Partner = self.env['res.partner'].sudo()
+        Partner.flush_model(['parent_path'])
+        return SQL(" UNION ALL ").join(
+            SQL(
+                "SELECT %s AS holding_id, id AS partner_id FROM res_partner WHERE parent_path LIKE %s",
+                partner.id, f"{partner.parent_path}%",
+            )
+            for partner in Partner.browse(sorted(partner_ids))
+        )
+
+    @api.model
+    def _get_hierarchy_totals(self, keys, date, own_due):
+        """Barcha mijozlar uchun ``parent_path`` prefiksi bo'yicha bitta so'rov.
+
+        ``own_due`` bo'lsa qarz faqat mijozning o'z qatorlaridan olinadi. Har bir qator
+        o'z valyutasidan ``date`` kursi bilan bir marta konvertatsiya qilinadi.
+        """
+        partner_ids = tuple({partner_id for partner_id, __ in keys})
+        if not partner_ids:
+            return {}
+        self._run_deferred_refresh()
+        self.flush_model([
+            'partner_id', 'company_id', 'currency_id', 'posted_due', 'open_sales', 'invoice_count', 'order_count',
+        ])
+        due_filter = SQL("FILTER (WHERE e.partner_id = h.holding_id)") if own_due else SQL()
+        rows = self.env.execute_query(SQL(
+            """
+            SELECT h.holding_id, e.company_id, e.currency_id,
+                   COALESCE(SUM(e.posted_due) %s, 0)::float8, SUM(e.open_sales)::float8,
+                   COALESCE(SUM(e.invoice_count) %s, 0), SUM(e.order_count)
+              FROM (%s) h
+              JOIN customer_credit_exposure e ON e.partner_id = h.partner_id
+          GROUP BY h.holding_id, e.company_id, e.currency_id
+            """,
+            due_filter, due_filter, self._subtree_query(partner_ids),
+        ))
+        due_by_partner = defaultdict(dict)
+        open_sales_by_partner = defaultdict(dict)
+        for partner_id, company_id, currency_id, posted_due, open_sales, __, __ in rows:
+            due_by_partner[partner_id][currency_id, company_id, date] = posted_due
+            open_sales_by_partner[partner_id][currency_id, company_id, date] = open_sales
+        self.env['customer.credit.perf.sample']._add_scanned(
+            invoice_count=sum(row[5] for row in rows),
+            order_count=sum(row[6] for row in rows),
+        )
+        Converter = self.env['customer.credit.currency']
+        Converter._preload_rates(
+            [row_key for amounts in due_by_partner.values() for row_key in amounts]
+            + [(currency.id, company_id, date)
+               for partner_id, currency in keys
+               for __, company_id, __ in due_by_partner[partner_id]]
+        )
+        return {
+            (partner_id, currency): (
+                Converter._convert_grouped(due_by_partner[partner_id], currency),
+                Converter._convert_grouped(open_sales_by_partner[partner_id], currency),
+            )
+            for partner_id, currency in keys
+        }
+
+    @api.model
+    def _get_partner_totals_snapshot(self, keys, date):
+        """``_get_partner_totals`` ning keshlangan varianti (forma onchange'lari uchun).
+
+        Faqat daftar versiyalari o'qiladi; hisob-faktura, to'lov yoki tasdiqlangan
+        buyurtma o'zgarsa qatorga yangi versiya beriladi va qiymat qayta hisoblanadi.
+        Bloklovchi tekshiruv bu keshni ishlatmaydi.
+        """
+        partner_ids = tuple({partner_id for partner_id, __ in keys})
+        if not partner_ids:
+            return {}
+        self._run_deferred_refresh()
+        self.flush_model(['partner_id', 'company_id', 'currency_id', 'version'])
+        stamps = defaultdict(list)
+        for partner_id, *stamp in self.env.execute_query(SQL(
+            """
+            SELECT h.holding_id, e.partner_id, e.company_id, e.currency_id, e.version
+              FROM (%s) h
+              JOIN customer_credit_exposure e ON e.partner_id = h.partner_id
+            """,
+            self._subtree_query(partner_ids),
+        )):
+            stamps[partner_id].append(tuple(stamp))
+        dbname = self.env.cr.dbname
+        cache_keys = {
+            (partner_id, currency): (dbname, partner_id, currency.id, date, tuple(sorted(stamps[partner_id])))
+            for partner_id, currency in keys
+        }
+        result = {}
+        missing = set()
+        for key, cache_key in cache_keys.items():
+            try:
+                result[key] = _SNAPSHOTS[cache_key]
+            except KeyError:
+                missing.add(key)
+        if missing:
+            for key, totals in self._get_partner_totals(missing, date).items():
+                _SNAPSHOTS[cache_keys[key]] = result[key] = totals
+        return result
+
+    def _upsert(self, posted_due, open_sales):
+        keys = posted_due.keys() | open_sales.keys()
+        if keys:
+            rows = [
+                SQL(
+                    "(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, now() at time zone 'UTC', now() at time zone 'UTC')",
+                    *key,
+                    *posted_due.get(key, (0.0, 0)),
+                    *open_sales.get(key, (0.0, 0)),
+                    self._next_version(),
+                    self.env.uid, self.env.uid,
+                )
+                for key in sorted(keys)
+            ]
+            self.env.cr.execute(SQL(
+                """
+                INSERT INTO customer_credit_exposure
+                       (partner_id, company_id, currency_id, posted_due, invoice_count, open_sales, order_count,
+                        version, create_uid, write_uid, create_date, write_date)
+                VALUES %s
+                ON CONFLICT (partner_id, company_id, currency_id) DO UPDATE
+                   SET posted_due = EXCLUDED.posted_due,
+                       invoice_count = EXCLUDED.invoice_count,
+                       open_sales = EXCLUDED.open_sales,
+                       order_count = EXCLUDED.order_count,
+                       version = EXCLUDED.version,
+                       write_uid = EXCLUDED.write_uid,
+                       write_date = EXCLUDED.write_date
+                """,
+                SQL(", ").join(rows),
+            ))
+        self.invalidate_model(['posted_due', 'invoice_count', 'open_sales', 'order_count', 'version'])
+
+    @api.model
+    def _lock(self, keys):
+        """(commercial partner id, company id) daftar qatorlarini tranzaksiya oxirigacha qulflash.
+
+        Qulf kompaniya valyutasidagi qatorga qo'yiladi; qator yo'q bo'lsa yaratiladi. Parallel tranzaksiya shu mijozni tekshirib
+        commit qilgan bo'lsa, PostgreSQL serialization xatosini beradi va Odoo
+        so'rovni yangi ma'lumot bilan qayta bajaradi. Boshqa mijozlar bloklanmaydi.
+        Kutish vaqti (soniya) qaytariladi.
+        """
+        if not keys:
+            return 0.0
+        Company = self.env['res.company'].sudo()
+        start = time.perf_counter()
+        self.env.cr.execute(SQL(
+            """
+            INSERT INTO customer_credit_exposure
+                   (partner_id, company_id, currency_id, posted_due, invoice_count, open_sales, order_count,
+                    version, create_uid, write_uid, create_date, write_date)
+            VALUES %s
+            ON CONFLICT (partner_id, company_id, currency_id) DO UPDATE
+               SET write_date = EXCLUDED.write_date
+            """,
+            SQL(", ").join(
+                SQL(
+                    "(%s, %s, %s, 0, 0, 0, 0, %s, %s, %s, now() at time zone 'UTC', now() at time zone 'UTC')",
+                    partner_id, company_id, Company.browse(company_id).currency_id.id,
+                    self._next_version(), self.env.uid, self.env.uid,
+                )
+                for partner_id, company_id in sorted(keys)
+            ),
+        ))
+        self.invalidate_model(['write_date'])
+        waited = time.perf_counter() - start
+        if waited > LOCK_WAIT_LOG_THRESHOLD:
+            _logger.info(
+                "Credit check waited %.3fs for exposure lock of partners %s",
+                waited, sorted({partner_id for partner_id, __ in keys}),
+            )
+        else:
+            _logger.debug("Credit exposure lock acquired in %.3fs", waited)
+        return waited
+
+    @api.model
+    def _schedule_refresh(self, partners):
+        """Mijozlarni commit oldidan bitta ``_refresh`` ga yig'ish.
+
+        Daftarni o'qiydigan metodlar kutilayotgan mijozlarni avval o'zlari yangilaydi.
+        """
+        partner_ids = set(partners.commercial_partner_id.ids)
+        if not partner_ids:
+            return
+        precommit = self.env.cr.precommit
+        if REFRESH_KEY not in precommit.data:
+            precommit.add(self._run_deferred_refresh)
+        precommit.data.setdefault(REFRESH_KEY, set()).update(partner_ids)
+
+    @api.model
+    def _run_deferred_refresh(self):
+        partner_ids = self.env.cr.precommit.data.pop(REFRESH_KEY, set())
+        if partner_ids:
+            self._refresh(self.env['res.partner'].browse(sorted(partner_ids)))
+
+    @api.model
+    @instrumented('exposure_refresh', lambda self, partners: partners)
+    def _refresh(self, partners):
+        """Faqat berilgan mijozlar daftar qatorlarini qayta hisoblash"""
+        partner_ids = sorted(set(partners.commercial_partner_id.ids))
+        if not partner_ids:
+            return
+        self.env.flush_all()
+        posted_due = self._aggregate_posted_due(partner_ids)
+        open_sales = self._aggregate_open_sales(partner_ids)
+        self.env.cr.execute(SQL(
+            "UPDATE customer_credit_exposure"
+            "   SET posted_due = 0, invoice_count = 0, open_sales = 0, order_count = 0, version = %s"
+            " WHERE partner_id IN %s",
+            self._next_version(),
+            tuple(partner_ids),
+        ))
+        self._upsert(posted_due, open_sales)
+
+    @api.model
+    def _rebuild(self):
+        """Daftarni noldan qayta qurish (tuzatish uchun)"""
+        self.env.cr.precommit.data.pop(REFRESH_KEY, None)
+        self.env.flush_all()
+        self.env.cr.execute(SQL("DELETE FROM customer_credit_exposure"))
+        self._upsert(self._aggregate_posted_due(), self._aggregate_open_sales())
+        return True
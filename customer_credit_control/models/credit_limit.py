@@ -1,5 +1,8 @@
 from odoo import models, fields, api
 from odoo.exceptions import ValidationError, AccessError
+from odoo.tools import SQL
+
+from .credit_perf_sample import instrumented
 
 
 class CustomerCreditLimit(models.Model):
@@ -9,23 +12,34 @@ class CustomerCreditLimit(models.Model):
 
     partner_id = fields.Many2one('res.partner', string='Mijoz', required=True, ondelete='cascade')
     credit_limit = fields.Monetary(string='Kredit Limiti', required=True)
+    group_credit_limit = fields.Monetary(
+        string='Guruh Kredit Limiti',
+        help="Mijoz va uning barcha sho'ba korxonalari (hamkorlar ierarxiyasi bo'yicha) "
+             "umumiy riski uchun limit. 0 - guruh limiti yo'q.",
+    )
     currency_id = fields.Many2one('res.currency', string='Valyuta',
                                   default=lambda self: self.env.company.currency_id)
     active = fields.Boolean(default=True)
     note = fields.Text(string='Izohlar')
     total_due = fields.Monetary(string='Jami Qarz', compute='_compute_total_due', store=True)
     remaining_credit = fields.Monetary(string='Qolgan Kredit', compute='_compute_remaining_credit', store=True)
+    total_due_dirty = fields.Boolean(string='Qarz Eskirgan', readonly=True, copy=False)
 
+    _total_due_dirty_idx = models.Index('(id) WHERE total_due_dirty IS TRUE')
+    _partner_active_unique = models.UniqueIndex(
+        '(partner_id) WHERE active IS TRUE',
+        "Bir mijoz uchun faqat bitta aktiv kredit limit bo'lishi mumkin!",
+    )
 
-    @api.depends('partner_id')
+    @api.depends('partner_id', 'currency_id')
     def _compute_total_due(self):
+        totals = self.env['customer.credit.exposure']._get_partner_totals(
+            {(limit.partner_id.id, limit.currency_id) for limit in self if limit.partner_id},
+            fields.Date.context_today(self),
+        )
         for limit in self:
             if limit.partner_id:
-                limit.total_due = limit._get_partner_total_due(
-                    partner=limit.partner_id,
-                    company=self.env.company,
-                    target_currency=limit.currency_id,
-                )
+                limit.total_due = totals[limit.partner_id.id, limit.currency_id][0]
             else:
                 limit.total_due = 0
 
@@ -36,71 +50,84 @@ class CustomerCreditLimit(models.Model):
             if partner_id:
                 partner = self.env['res.partner'].browse(partner_id)
                 vals['partner_id'] = partner.commercial_partner_id.id
+        self._clear_active_limit_cache()
         return super().create(vals_list)
 
     def write(self, vals):
         if vals.get('partner_id'):
             partner = self.env['res.partner'].browse(vals['partner_id'])
             vals['partner_id'] = partner.commercial_partner_id.id
+        if 'partner_id' in vals or 'active' in vals:
+            self._clear_active_limit_cache()
         return super().write(vals)
 
-    def _get_partner_total_due(self, partner, company, target_currency):
-        commercial_partner = partner.commercial_partner_id
-        invoices = self.env['account.move'].search([
-            ('commercial_partner_id', '=', commercial_partner.id),
-            ('state', '=', 'posted'),
-            ('payment_state', 'in', ['not_paid', 'partial', 'in_payment']),
-            ('move_type', 'in', ['out_invoice', 'out_refund']),
-        ])
-        total_due_company_currency = sum(invoices.mapped('amount_residual_signed'))
-        return company.currency_id._convert(
-            total_due_company_currency,
-            target_currency,
-            company,
-            fields.Date.context_today(self),
-        )
+    def unlink(self):
+        self._clear_active_limit_cache()
+        return super().unlink()
+
+    def _clear_active_limit_cache(self):
+        self.env.cr.cache.pop('customer_credit_control.active_limits', None)
+
+    @api.model
+    def _get_active_limits(self, partners):
+        """commercial partner id -> aktiv limit; har bir mijoz so'rov davomida bir marta o'qiladi"""
+        cache = self.env.cr.cache.setdefault('customer_credit_control.active_limits', {})
+        partner_ids = set(partners.commercial_partner_id.ids)
+        missing_ids = partner_ids - cache.keys()
+        if missing_ids:
+            cache.update(dict.fromkeys(missing_ids, False))
+            for limit in self.search([('partner_id', 'in', list(missing_ids)), ('active', '=', True)]):
+                cache[limit.partner_id.id] = limit.id
+        return {
+            partner_id: self.browse(cache[partner_id])
+            for partner_id in partner_ids
+            if cache[partner_id]
+        }
 
-    def _get_partner_open_sales_exposure(self, partner, company, target_currency, exclude_order=None):
-        commercial_partner = partner.commercial_partner_id
-        domain = [
-            ('partner_id', 'child_of', commercial_partner.id),
-            ('state', '=', 'sale'),
-        ]
-        if exclude_order:
-            domain.append(('id', '!=', exclude_order.id))
-
-        open_orders = self.env['sale.order'].search(domain)
-        exposure = 0.0
-        for so in open_orders:
-            if so.amount_to_invoice <= 0:
-                continue
-            exposure += so.currency_id._convert(
-                so.amount_to_invoice,
-                target_currency,
-                so.company_id,
-                so.date_order.date() if so.date_order else fields.Date.context_today(so),
-            )
-        return exposure
+    @api.model
+    def _mark_total_due_dirty(self, partners):
+        partner_ids = tuple(set(partners.commercial_partner_id.ids))
+        if not partner_ids:
+            return
+        self.env.cr.execute(SQL(
+            """
+            UPDATE customer_credit_limit
+               SET total_due_dirty = TRUE
+             WHERE partner_id IN %s
+               AND total_due_dirty IS NOT TRUE
+            """,
+            partner_ids,
+        ))
+        self.invalidate_model(['total_due_dirty'])
+
+    @api.model
+    def _can_commit(self):
+        """Cron bo'laklari orasida commit qilish mumkinmi (testlarda yo'q)"""
+        return not self.env.registry.in_test_mode()
+
+    @api.model
+    def _cron_recompute_total_due(self, batch_size=1000):
+        """Eskirgan limitlarni bo'laklab qayta hisoblash, har bo'lakdan keyin commit"""
+        auto_commit = self._can_commit()
+        Limit = self.with_context(active_test=False)
+        while True:
+            limits = Limit.search([('total_due_dirty', '=', True)], order='id', limit=batch_size)
+            if not limits:
+                break
+            self.env.add_to_compute(self._fields['total_due'], limits)
+            self.env.add_to_compute(self._fields['remaining_credit'], limits)
+            limits.total_due_dirty = False
+            limits.flush_recordset()
+            if auto_commit:
+                self.env.cr.commit()
+            if len(limits) < batch_size:
+                break
 
     @api.depends('credit_limit', 'total_due')
     def _compute_remaining_credit(self):
         for limit in self:
             limit.remaining_credit = limit.credit_limit - limit.total_due
 
-    @api.constrains('partner_id', 'active')
-    def _check_unique_active_credit_limit(self):
-        for record in self:
-            if record.active:
-                existing = self.search([
-                    ('partner_id', '=', record.partner_id.commercial_partner_id.id),
-                    ('active', '=', True),
-                    ('id', '!=', record.id)
-                ])
-                if existing:
-                    raise ValidationError(
-                        'Bir mijoz uchun faqat bitta aktiv kredit limit bo\'lishi mumkin!'
-                    )
-
     def toggle_active(self):
         if not self.env.user.has_group('account.group_account_manager'):
             raise AccessError("Faqat Accounting Manager aktiv/pasiv holatini o'zgartira oladi.")
@@ -111,81 +138,197 @@ class CustomerCreditLimit(models.Model):
 class SaleOrder(models.Model):
     _inherit = 'sale.order'
 
+    _credit_open_sales_idx = models.Index("(partner_id, date_order) WHERE state = 'sale'")
+
     available_credit = fields.Monetary(string='Mavjud Kredit', compute='_compute_available_credit')
     credit_limit_warning = fields.Boolean(compute='_compute_credit_limit_warning')
 
+    def _get_credit_exposure(self, use_snapshot=False):
+        """Buyurtmalar uchun kredit riskini ``customer.credit.exposure`` daftaridan olish.
+
+        Natija: ``{order: {'limit', 'total_due', 'open_sales', 'own_open_sales', 'order_amount'}}``,
+        summalar limit valyutasida. Aktiv limiti yo'q buyurtmalar natijaga kirmaydi.
+        ``use_snapshot`` mijoz riskini keshlangan nusxadan oladi (faqat ko'rsatish uchun).
+        """
+        orders = self.filtered('partner_id')
+        partners = orders.partner_id.commercial_partner_id
+        if not partners:
+            return {}
+
+        limit_by_partner = self.env['customer.credit.limit']._get_active_limits(partners)
+        orders = orders.filtered(lambda o: o.partner_id.commercial_partner_id.id in limit_by_partner)
+        if not orders:
+            return {}
+
+        Exposure = self.env['customer.credit.exposure']
+        today = fields.Date.context_today(self)
+        get_totals = Exposure._get_partner_totals_snapshot if use_snapshot else Exposure._get_partner_totals
+        totals = get_totals(
+            {(partner_id, limit.currency_id) for partner_id, limit in limit_by_partner.items()},
+            today,
+        )
+
+        own_amounts = self._preload_credit_amounts(
+            {order: [limit_by_partner[order.partner_id.commercial_partner_id.id].currency_id] for order in orders},
+            today,
+        )
+
+        result = {}
+        for order in orders:
+            partner = order.partner_id.commercial_partner_id
+            limit = limit_by_partner[partner.id]
+            own_open_sales, order_amount = order._get_credit_amounts(limit.currency_id, own_amounts, today)
+            total_due, open_sales = totals[partner.id, limit.currency_id]
+            result[order] = {
+                'limit': limit,
+                'total_due': total_due,
+                'open_sales': open_sales - own_open_sales,
+                'own_open_sales': own_open_sales,
+                'order_amount': order_amount,
+            }
+        return result
+
+    def _preload_credit_amounts(self, currencies_by_order, today):
+        """Kerakli kurslarni bitta so'rovda yuklash; tasdiqlangan buyurtmalarning
+        buyurtma valyutasidagi hisob-fakturasiz summasini qaytarish."""
+        Exposure = self.env['customer.credit.exposure']
+        rate_keys = []
+        for order, currencies in currencies_by_order.items():
+            order_date = Exposure._get_order_date(order)
+            rate_keys += [
+                (order.currency_id.id, order.company_id.id, order_date),
+                (order.currency_id.id, order.company_id.id, today),
+            ]
+            for currency in currencies:
+                rate_keys += [
+                    (currency.id, order.company_id.id, order_date),
+                    (currency.id, order.company_id.id, today),
+                ]
+        self.env['customer.credit.currency']._preload_rates(rate_keys)
+        orders = self.browse().union(*currencies_by_order)
+        return Exposure._get_orders_open_amounts(orders._origin.filtered(lambda o: o.state == 'sale'))
+
+    def _get_credit_amounts(self, currency, own_amounts, today):
+        """(buyurtmaning daftardagi o'z ulushi, buyurtma summasi) ``currency`` da"""
+        self.ensure_one()
+        Converter = self.env['customer.credit.currency']
+        own_open_sales = Converter._convert(
+            own_amounts.get(self._origin.id, 0.0),
+            self.currency_id,
+            currency,
+            self.company_id,
+            today,
+        )
+        order_amount = Converter._convert(
+            self.amount_total,
+            self.currency_id,
+            currency,
+            self.company_id,
+            self.env['customer.credit.exposure']._get_order_date(self),
+        )
+        return own_open_sales, order_amount
+
+    def _get_group_credit_limits(self):
+        """order -> ota mijozlardagi (o'zi ham) guruh limitlari, ``parent_path`` bo'yicha"""
+        orders = self.filtered('partner_id')
+        ancestor_ids_by_order = {
+            order: [int(pid) for pid in order.partner_id.commercial_partner_id.parent_path.split('/') if pid]
+            for order in orders
+        }
+        all_ids = {pid for ids in ancestor_ids_by_order.values() for pid in ids}
+        limits = self.env['customer.credit.limit']._get_active_limits(self.env['res.partner'].browse(all_ids))
+        result = {}
+        for order, ancestor_ids in ancestor_ids_by_order.items():
+            group_limits = [
+                limits[pid] for pid in ancestor_ids
+                if pid in limits and limits[pid].group_credit_limit > 0
+            ]
+            if group_limits:
+                result[order] = group_limits
+        return result
+
+    def _get_group_credit_exposure(self):
+        """Guruh limitlari bo'yicha risk: ``{order: [{'limit', 'total_due', 'open_sales',
+        'own_open_sales', 'order_amount'}, ...]}``, summalar guruh limiti valyutasida."""
+        group_limits_by_order = self._get_group_credit_limits()
+        if not group_limits_by_order:
+            return {}
+        today = fields.Date.context_today(self)
+        holding_limits = {limit for limits in group_limits_by_order.values() for limit in limits}
+        totals = self.env['customer.credit.exposure']._get_group_totals(
+            {(limit.partner_id.id, limit.currency_id) for limit in holding_limits},
+            today,
+        )
+        own_amounts = self._preload_credit_amounts(
+            {order: [limit.currency_id for limit in limits] for order, limits in group_limits_by_order.items()},
+            today,
+        )
+        result = {}
+        for order, limits in group_limits_by_order.items():
+            entries = []
+            for limit in limits:
+                own_open_sales, order_amount = order._get_credit_amounts(limit.currency_id, own_amounts, today)
+                total_due, open_sales = totals[limit.partner_id.id, limit.currency_id]
+                entries.append({
+                    'limit': limit,
+                    'total_due': total_due,
+                    'open_sales': open_sales - own_open_sales,
+                    'own_open_sales': own_open_sales,
+                    'order_amount': order_amount,
+                })
+            result[order] = entries
+        return result
+
     @api.depends('partner_id')
     def _compute_available_credit(self):
+        exposure_by_order = self._get_credit_exposure(use_snapshot=True)
         for order in self:
-            credit_limit = self.env['customer.credit.limit'].search([
-                ('partner_id', '=', order.partner_id.commercial_partner_id.id),
-                ('active', '=', True)
-            ], limit=1)
-
-            if credit_limit:
-                live_total_due = credit_limit._get_partner_total_due(
-                    partner=order.partner_id,
-                    company=order.company_id,
-                    target_currency=credit_limit.currency_id,
+            exposure = exposure_by_order.get(order)
+            if exposure:
+                order.available_credit = exposure['limit'].credit_limit - (
+                    exposure['total_due'] + exposure['open_sales']
                 )
-                open_sales_exposure = credit_limit._get_partner_open_sales_exposure(
-                    partner=order.partner_id,
-                    company=order.company_id,
-                    target_currency=credit_limit.currency_id,
-                    exclude_order=order,
-                )
-                order.available_credit = credit_limit.credit_limit - (live_total_due + open_sales_exposure)
             else:
                 order.available_credit = 0
 
     @api.depends('available_credit', 'amount_total')
     def _compute_credit_limit_warning(self):
+        exposure_by_order = self._get_credit_exposure(use_snapshot=True)
         for order in self:
-            credit_limit = self.env['customer.credit.limit'].search([
-                ('partner_id', '=', order.partner_id.commercial_partner_id.id),
-                ('active', '=', True),
-            ], limit=1)
-            if not credit_limit:
+            exposure = exposure_by_order.get(order)
+            if not exposure:
                 order.credit_limit_warning = False
                 continue
-
-            order_total_in_limit_currency = order.currency_id._convert(
-                order.amount_total,
-                credit_limit.currency_id,
-                order.company_id,
-                order.date_order.date() if order.date_order else fields.Date.context_today(order),
-            )
-            order.credit_limit_warning = (
-                order_total_in_limit_currency > order.available_credit
-            )
-
-    def _check_credit_limit_restriction(self):
+            order.credit_limit_warning = exposure['order_amount'] > order.available_credit
+
+    def _lock_credit_exposure(self):
+        """Faqat aktiv limiti bor mijozlar bo'yicha tekshiruv va tasdiqlashni ketma-ketlashtirish"""
+        orders = self.filtered('partner_id')
+        limit_by_partner = self.env['customer.credit.limit']._get_active_limits(orders.partner_id)
+        keys = {
+            (order.partner_id.commercial_partner_id.id, order.company_id.id)
+            for order in orders
+            if order.partner_id.commercial_partner_id.id in limit_by_partner
+        }
+        for order, group_limits in orders._get_group_credit_limits().items():
+            keys.update((limit.partner_id.id, order.company_id.id) for limit in group_limits)
+        return self.env['customer.credit.exposure']._lock(keys)
+
+    @instrumented('credit_check', lambda self, lock=False: self.partner_id)
+    def _check_credit_limit_restriction(self, lock=False):
+        """``lock=True`` faqat tasdiqlashda: qoralama satrlar tekshiruvi qulfsiz qoladi"""
+        if lock:
+            self._lock_credit_exposure()
+        exposure_by_order = self._get_credit_exposure()
         for order in self:
-            credit_limit_rec = self.env['customer.credit.limit'].search([
-                ('partner_id', '=', order.partner_id.commercial_partner_id.id),
-                ('active', '=', True)
-            ], limit=1)
-
-            if not credit_limit_rec:
+            exposure = exposure_by_order.get(order)
+            if not exposure:
                 continue
 
-            live_total_due = credit_limit_rec._get_partner_total_due(
-                partner=order.partner_id,
-                company=order.company_id,
-                target_currency=credit_limit_rec.currency_id,
-            )
-            open_sales_exposure = credit_limit_rec._get_partner_open_sales_exposure(
-                partner=order.partner_id,
-                company=order.company_id,
-                target_currency=credit_limit_rec.currency_id,
-                exclude_order=order,
-            )
-            order_total_in_limit_currency = order.currency_id._convert(
-                order.amount_total,
-                credit_limit_rec.currency_id,
-                order.company_id,
-                order.date_order.date() if order.date_order else fields.Date.context_today(order),
-            )
+            credit_limit_rec = exposure['limit']
+            live_total_due = exposure['total_due']
+            open_sales_exposure = exposure['open_sales']
+            order_total_in_limit_currency = exposure['order_amount']
             total_risk = live_total_due + open_sales_exposure + order_total_in_limit_currency
             if total_risk > credit_limit_rec.credit_limit:
                 raise ValidationError(
@@ -210,6 +353,106 @@ class SaleOrder(models.Model):
                     )
                 )
 
+        group_exposure_by_order = self._get_group_credit_exposure()
+        for order in self:
+            for group in group_exposure_by_order.get(order, []):
+                group_limit = group['limit']
+                total_risk = group['total_due'] + group['open_sales'] + group['order_amount']
+                if total_risk > group_limit.group_credit_limit:
+                    symbol = group_limit.currency_id.symbol
+                    raise ValidationError(
+                        "Guruh kredit limiti oshdi. Amaliyot ruxsat etilmaydi.\n"
+                        "Mijoz: %s\n"
+                        "Guruh: %s\n"
+                        "Guruh limiti: %s %s\n"
+                        "Guruh qarzi: %s %s\n"
+                        "Guruh ochiq savdo riski: %s %s\n"
+                        "Buyurtma summasi: %s %s\n"
+                        "Jami risk: %s %s" % (
+                            order.partner_id.name,
+                            group_limit.partner_id.name,
+                            group_limit.group_credit_limit, symbol,
+                            group['total_due'], symbol,
+                            group['open_sales'], symbol,
+                            group['order_amount'], symbol,
+                            total_risk, symbol,
+                        )
+                    )
+
+    def check_credit_batch(self):
+        """Buyurtmalarni birgalikda, mijoz bo'yicha ketma-ket tekshirish (xato ko'tarmaydi).
+
+        Qabul qilingan buyurtma summasi shu mijozning keyingi buyurtmalari riskiga qo'shiladi.
+        Natija: ``{order id: {'passed', 'credit_limit', 'currency_id', 'total_due',
+        'open_sales', 'order_amount', 'total_risk', 'group_checks'}}``; ``group_checks`` da
+        guruh limitlari bo'yicha xuddi shunday raqamlar. Limiti yo'q buyurtmalar o'tgan hisoblanadi.
+        """
+        self._lock_credit_exposure()
+        exposure_by_order = self._get_credit_exposure()
+        group_exposure_by_order = self._get_group_credit_exposure()
+        running_open_sales = {}
+        results = {}
+        ordered = self.sorted(lambda o: (
+            o.partner_id.commercial_partner_id.id or 0,
+            o.date_order or fields.Datetime.now(),
+            o.id,
+        ))
+        for order in ordered:
+            checks = []
+            exposure = exposure_by_order.get(order)
+            if exposure:
+                checks.append((('entity', exposure['limit'].id), exposure['limit'].credit_limit, exposure))
+            for group in group_exposure_by_order.get(order, []):
+                checks.append((('group', group['limit'].id), group['limit'].group_credit_limit, group))
+
+            evaluated = []
+            for key, limit_amount, data in checks:
+                partner_open_sales = running_open_sales.setdefault(
+                    key, data['open_sales'] + data['own_open_sales'],
+                )
+                open_sales = partner_open_sales - data['own_open_sales']
+                total_risk = data['total_due'] + open_sales + data['order_amount']
+                evaluated.append((key, limit_amount, data, open_sales, total_risk))
+            passed = all(total_risk <= limit_amount for __, limit_amount, __, __, total_risk in evaluated)
+            if passed:
+                for key, __, data, open_sales, __ in evaluated:
+                    running_open_sales[key] = open_sales + data['order_amount']
+
+            figures = [
+                {
+                    'passed': total_risk <= limit_amount,
+                    'credit_limit': limit_amount,
+                    'currency_id': data['limit'].currency_id.id,
+                    'total_due': data['total_due'],
+                    'open_sales': open_sales,
+                    'order_amount': data['order_amount'],
+                    'total_risk': total_risk,
+                }
+                for __, limit_amount, data, open_sales, total_risk in evaluated
+            ]
+            if exposure:
+                results[order.id] = dict(figures[0], passed=passed, group_checks=figures[1:])
+            else:
+                results[order.id] = {
+                    'passed': passed,
+                    'credit_limit': False,
+                    'currency_id': False,
+                    'total_due': 0.0,
+                    'open_sales': 0.0,
+                    'order_amount': 0.0,
+                    'total_risk': 0.0,
+                    'group_checks': figures,
+                }
+        return results
+
+    def action_confirm_credit_batch(self):
+        """Kredit tekshiruvidan o'tgan buyurtmalarni tasdiqlash, qolganlarini o'zgartirmaslik"""
+        results = self.check_credit_batch()
+        passing = self.filtered(lambda o: results[o.id]['passed'])
+        if passing:
+            passing.action_confirm()
+        return results
+
     def action_view_credit_limit(self):
         self.ensure_one()
         if not (
@@ -219,10 +462,10 @@ class SaleOrder(models.Model):
         ):
             raise AccessError("Kredit limitni faqat Sales yoki Accounting rollari ko'ra oladi.")
 
-        credit_limit = self.env['customer.credit.limit'].search([
-            ('partner_id', '=', self.partner_id.commercial_partner_id.id),
-            ('active', '=', True)
-        ], limit=1)
+        commercial_partner = self.partner_id.commercial_partner_id
+        credit_limit = self.env['customer.credit.limit']._get_active_limits(commercial_partner).get(
+            commercial_partner.id
+        )
 
         if credit_limit:
             return {
@@ -235,8 +478,27 @@ class SaleOrder(models.Model):
         else:
             raise ValidationError('Ushbu mijoz uchun kredit limiti topilmadi!')
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        orders = super().create(vals_list)
+        confirmed = orders.filtered(lambda o: o.state == 'sale')
+        if confirmed:
+            self.env['customer.credit.exposure']._schedule_refresh(confirmed.partner_id)
+        return orders
+
+    def write(self, vals):
+        if not {'state', 'partner_id', 'company_id', 'currency_id', 'date_order'}.intersection(vals):
+            return super().write(vals)
+        confirmed_before = self.filtered(lambda o: o.state == 'sale')
+        partners = confirmed_before.partner_id
+        result = super().write(vals)
+        partners |= self.filtered(lambda o: o.state == 'sale').partner_id
+        if partners:
+            self.env['customer.credit.exposure']._schedule_refresh(partners)
+        return result
+
     def action_confirm(self):
-        self._check_credit_limit_restriction()
+        self._check_credit_limit_restriction(lock=True)
         return super().action_confirm()
 
     def _create_invoices(self, grouped=False, final=False, date=None):
@@ -247,35 +509,95 @@ class SaleOrder(models.Model):
 class SaleOrderLine(models.Model):
     _inherit = 'sale.order.line'
 
+    _credit_exposure_fields = {
+        'product_id', 'product_uom_qty', 'price_unit', 'discount', 'tax_ids', 'display_type',
+    }
+
+    def _refresh_credit_exposure(self):
+        confirmed = self.order_id.filtered(lambda o: o.state == 'sale')
+        if confirmed:
+            self.env['customer.credit.exposure']._schedule_refresh(confirmed.partner_id)
+
+    def _schedule_credit_limit_check(self):
+        """Buyurtmalarni commit oldidan bitta tekshiruvga yig'ish.
+
+        ``credit_check_immediate`` konteksti bilan tekshiruv darhol bajariladi.
+        """
+        orders = self.mapped('order_id').filtered(lambda o: o.state in ('draft', 'sent', 'sale'))
+        if not orders:
+            return
+        if self.env.context.get('credit_check_immediate'):
+            orders._check_credit_limit_restriction()
+            return
+        order_ids = self.env.cr.precommit.data.setdefault('customer_credit_control.check_order_ids', set())
+        if not order_ids:
+            self.env.cr.precommit.add(self.env['sale.order.line']._run_deferred_credit_limit_check)
+        order_ids.update(orders.ids)
+
+    @api.model
+    def _run_deferred_credit_limit_check(self):
+        order_ids = self.env.cr.precommit.data.pop('customer_credit_control.check_order_ids', set())
+        orders = self.env['sale.order'].browse(sorted(order_ids)).exists()
+        orders = orders.filtered(lambda o: o.state in ('draft', 'sent', 'sale'))
+        if orders:
+            orders._check_credit_limit_restriction()
+
     @api.model_create_multi
     def create(self, vals_list):
         lines = super().create(vals_list)
-        orders = lines.mapped('order_id').filtered(lambda o: o.state in ('draft', 'sent', 'sale'))
-        if orders:
-            orders._check_credit_limit_restriction()
+        lines._refresh_credit_exposure()
+        lines._schedule_credit_limit_check()
         return lines
 
     def write(self, vals):
         result = super().write(vals)
-        orders = self.mapped('order_id').filtered(lambda o: o.state in ('draft', 'sent', 'sale'))
-        if orders:
-            orders._check_credit_limit_restriction()
+        if self._credit_exposure_fields.intersection(vals):
+            self._refresh_credit_exposure()
+        self._schedule_credit_limit_check()
         return result
 
 
 class ResPartner(models.Model):
     _inherit = 'res.partner'
 
+    credit_limit_ids = fields.One2many('customer.credit.limit', 'partner_id', string='Kredit Limitlari')
     credit_limit_count = fields.Integer(
         string='Credit Limit Count',
         compute='_compute_credit_limit_count',
     )
+    has_credit_limit = fields.Boolean(
+        string='Kredit Limiti Bor',
+        compute='_compute_credit_limit_count',
+        search='_search_has_credit_limit',
+    )
 
     def _compute_credit_limit_count(self):
+        groups = self.env['customer.credit.limit']._read_group(
+            [('partner_id', 'in', self.commercial_partner_id.ids)], ['partner_id'], ['__count'],
+        )
+        count_by_partner = {partner.id: count for partner, count in groups}
         for partner in self:
-            partner.credit_limit_count = self.env['customer.credit.limit'].search_count([
-                ('partner_id', '=', partner.commercial_partner_id.id)
-            ])
+            partner.credit_limit_count = count_by_partner.get(partner.commercial_partner_id.id, 0)
+            partner.has_credit_limit = bool(partner.credit_limit_count)
+
+    def _search_has_credit_limit(self, operator, value):
+        if operator in ('=', '!='):
+            operator, value = ('in' if operator == '=' else 'not in'), [value]
+        if operator not in ('in', 'not in'):
+            return NotImplemented
+        has_limit = (True in value) == (operator == 'in')
+        return [('commercial_partner_id.credit_limit_ids', '!=' if has_limit else '=', False)]
+
+    def write(self, vals):
+        """Kontakt boshqa kompaniyaga o'tsa, eski va yangi mijozlar daftari yangilanadi"""
+        if not {'parent_id', 'is_company'}.intersection(vals):
+            return super().write(vals)
+        old_partners = self.commercial_partner_id
+        result = super().write(vals)
+        partners = (old_partners | self.commercial_partner_id).commercial_partner_id
+        self.env['customer.credit.exposure']._schedule_refresh(partners)
+        self.env['customer.credit.limit']._mark_total_due_dirty(partners)
+        return result
 
     def action_view_credit_limits(self):
         self.ensure_one()
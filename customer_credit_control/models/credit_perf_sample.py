@@ -0,0 +1,106 @@
+import functools
+import logging
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+import psycopg2
+
+from odoo import models, fields, api
+from odoo.tools import SQL, str2bool
+
+_logger = logging.getLogger(__name__)
+
+COUNTERS_KEY = 'customer_credit_control.perf_counters'
+RETENTION_DAYS = 30
+
+
+def instrumented(operation, partner=None):
+    """Metod chaqiruvini o'lchab ``customer.credit.perf.sample`` ga yozadigan dekorator.
+
+    ``partner(self, *args, **kwargs)`` o'lchanayotgan mijozni qaytaradi; u faqat
+    instrumentatsiya yoqilganda chaqiriladi.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            Sample = self.env['customer.credit.perf.sample']
+            slow_ms = Sample._get_slow_threshold()
+            if slow_ms is None:
+                return method(self, *args, **kwargs)
+            with Sample._measure(operation, slow_ms, partner and partner(self, *args, **kwargs)):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class CustomerCreditPerfSample(models.Model):
+    _name = 'customer.credit.perf.sample'
+    _description = 'Kredit Nazorati Unumdorlik Namunasi'
+    _order = 'date desc, id desc'
+    _rec_name = 'operation'
+    _log_access = False
+
+    date = fields.Datetime(string='Vaqt', readonly=True, default=fields.Datetime.now, index=True)
+    operation = fields.Char(string='Amaliyot', readonly=True)
+    partner_id = fields.Many2one('res.partner', string='Mijoz', readonly=True, ondelete='set null')
+    user_id = fields.Many2one('res.users', string='Foydalanuvchi', readonly=True, ondelete='set null')
+    duration = fields.Float(string='Davomiyligi (ms)', readonly=True, aggregator='avg')
+    query_count = fields.Integer(string="SQL So'rovlar", readonly=True, aggregator='avg')
+    invoice_count = fields.Integer(string="Ko'rilgan Hisob-fakturalar", readonly=True, aggregator='avg')
+    order_count = fields.Integer(string="Ko'rilgan Buyurtmalar", readonly=True, aggregator='avg')
+
+    @api.model
+    def _get_slow_threshold(self):
+        """O'chirilgan bo'lsa None, aks holda millisekundlardagi sekin chaqiruv chegarasi"""
+        ICP = self.env['ir.config_parameter'].sudo()
+        if not str2bool(ICP.get_param('customer_credit_control.instrumentation', 'False')):
+            return None
+        return float(ICP.get_param('customer_credit_control.instrumentation_slow_ms', 100))
+
+    @api.model
+    def _add_scanned(self, invoice_count=0, order_count=0):
+        """Agregatsiya so'rovlari ko'rib chiqqan hujjatlar soni (faqat o'lchov paytida)"""
+        counters = self.env.cr.cache.get(COUNTERS_KEY)
+        if counters is not None:
+            counters['invoice_count'] += invoice_count
+            counters['order_count'] += order_count
+
+    @contextmanager
+    def _measure(self, operation, slow_ms, partner=None):
+        cr = self.env.cr
+        counters = cr.cache.setdefault(COUNTERS_KEY, {'invoice_count': 0, 'order_count': 0})
+        start_counters = dict(counters)
+        start_queries = cr.sql_log_count
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = (time.perf_counter() - start) * 1000
+            if duration >= slow_ms:
+                commercial_partner = partner.commercial_partner_id if partner else self.env['res.partner']
+                self._record({
+                    'operation': operation,
+                    'partner_id': commercial_partner.id if len(commercial_partner) == 1 else False,
+                    'user_id': self.env.uid,
+                    'duration': duration,
+                    'query_count': cr.sql_log_count - start_queries,
+                    'invoice_count': counters['invoice_count'] - start_counters['invoice_count'],
+                    'order_count': counters['order_count'] - start_counters['order_count'],
+                })
+
+    @api.model
+    def _record(self, vals):
+        """Namunani alohida tranzaksiyada yozish, asosiy tranzaksiya bekor qilinsa ham saqlanadi"""
+        try:
+            with self.env.registry.cursor() as cr:
+                self.env(cr=cr, su=True)[self._name].create(vals)
+        except psycopg2.Error:
+            _logger.warning("Could not record credit performance sample %s", vals['operation'], exc_info=True)
+
+    @api.autovacuum
+    def _gc_samples(self):
+        self.env.cr.execute(SQL(
+            "DELETE FROM customer_credit_perf_sample WHERE date < %s",
+            fields.Datetime.now() - timedelta(days=RETENTION_DAYS),
+        ))
@@ -0,0 +1 @@
+from . import credit_limit
@@ -0,0 +1,33 @@
+from odoo import models
+from odoo.tools import populate
+
+
+class CustomerCreditLimit(models.Model):
+    _inherit = 'customer.credit.limit'
+
+    _populate_sizes = {'small': 10, 'medium': 1000, 'large': 20000}
+    _populate_dependencies = ['res.partner', 'sale.order', 'account.move']
+
+    def _populate_factories(self):
+        partner_ids = self.env['res.partner'].browse(
+            self.env.registry.populated_models['res.partner']
+        ).commercial_partner_id.ids
+
+        def get_partner(counter, **kwargs):
+            return partner_ids[counter % len(partner_ids)]
+
+        def get_active(counter, **kwargs):
+            # bitta mijozga bitta aktiv limit
+            return counter < len(partner_ids)
+
+        return [
+            ('partner_id', populate.compute(get_partner)),
+            ('active', populate.compute(get_active)),
+            ('credit_limit', populate.randint(1000, 200000)),
+            ('group_credit_limit', populate.iterate([0, 0, 0, 0, 500000])),
+        ]
+
+    def _populate(self, size):
+        records = super()._populate(size)
+        self.env['customer.credit.exposure']._rebuild()
+        return records
@@ -0,0 +1 @@
+from . import credit_risk_report
\ No newline at end of file
@@ -0,0 +1,98 @@
+from odoo import models, fields, tools
+from odoo.tools import SQL
+
+
+class CustomerCreditRiskReport(models.Model):
+    _name = 'customer.credit.risk.report'
+    _description = 'Kredit Riski Hisoboti'
+    _auto = False
+    _rec_name = 'partner_id'
+    _order = 'utilization desc, partner_id'
+
+    credit_limit_id = fields.Many2one('customer.credit.limit', string='Kredit Limiti', readonly=True)
+    partner_id = fields.Many2one('res.partner', string='Mijoz', readonly=True)
+    company_id = fields.Many2one('res.company', string='Kompaniya', readonly=True)
+    currency_id = fields.Many2one('res.currency', string='Valyuta', readonly=True)
+    credit_limit = fields.Monetary(string='Kredit Limiti', readonly=True)
+    total_due = fields.Monetary(string='Jami Qarz', readonly=True)
+    open_sales = fields.Monetary(string='Ochiq Savdo Riski', readonly=True)
+    total_exposure = fields.Monetary(string='Jami Risk', readonly=True)
+    headroom = fields.Monetary(string='Qolgan Kredit', readonly=True)
+    utilization = fields.Float(string='Foydalanish (%)', aggregator='max', readonly=True)
+
+    def _query(self):
+        """Har bir aktiv limit va kompaniya uchun bitta qator, summalar limit valyutasida.
+
+        Raqamlar ``customer.credit.exposure`` daftaridan tekshiruvdagi kabi olinadi:
+        qarz mijozning o'ziniki, ochiq savdo esa ``parent_path`` bo'yicha sho'ba
+        korxonalar bilan birga. Limit va qolgan kredit mijozning birinchi qatorida
+        turadi, shuning uchun pivotdagi yig'indilar ikki marta hisoblanmaydi.
+        """
+        return SQL(
+            """
+            WITH limits AS (
+                SELECT id, partner_id, currency_id, credit_limit
+                  FROM customer_credit_limit
+                 WHERE active IS TRUE
+            ),
+            exposure AS (
+                SELECT l.id AS credit_limit_id, e.company_id, e.currency_id,
+                       COALESCE(SUM(e.posted_due) FILTER (WHERE e.partner_id = l.partner_id), 0) AS due,
+                       SUM(e.open_sales) AS open_sales
+                  FROM limits l
+                  JOIN res_partner h ON h.id = l.partner_id
+                  JOIN res_partner p ON starts_with(p.parent_path, h.parent_path)
+                  JOIN customer_credit_exposure e ON e.partner_id = p.id
+              GROUP BY l.id, e.company_id, e.currency_id
+            ),
+            latest_rate AS (
+                SELECT DISTINCT ON (currency_id, company_id) currency_id, company_id, rate
+                  FROM res_currency_rate
+                 WHERE name <= CURRENT_DATE
+              ORDER BY currency_id, company_id, name DESC
+            ),
+            converted AS (
+                SELECT l.id AS credit_limit_id, l.partner_id, l.currency_id, l.credit_limit, e.company_id,
+                       CASE WHEN e.company_id IS NULL OR e.currency_id = l.currency_id THEN 1
+                            ELSE COALESCE(lc.rate, ls.rate, 1) / COALESCE(ec.rate, es.rate, 1)
+                       END AS factor,
+                       COALESCE(e.due, 0) AS due,
+                       COALESCE(e.open_sales, 0) AS open_sales
+                  FROM limits l
+             LEFT JOIN exposure e ON e.credit_limit_id = l.id
+             LEFT JOIN latest_rate lc ON lc.currency_id = l.currency_id AND lc.company_id = e.company_id
+             LEFT JOIN latest_rate ls ON ls.currency_id = l.currency_id AND ls.company_id IS NULL
+             LEFT JOIN latest_rate ec ON ec.currency_id = e.currency_id AND ec.company_id = e.company_id
+             LEFT JOIN latest_rate es ON es.currency_id = e.currency_id AND es.company_id IS NULL
+            ),
+            per_company AS (
+                SELECT credit_limit_id, partner_id, currency_id, credit_limit, company_id,
+                       SUM(due * factor) AS total_due,
+                       SUM(open_sales * factor) AS open_sales
+                  FROM converted
+              GROUP BY credit_limit_id, partner_id, currency_id, credit_limit, company_id
+            ),
+            ranked AS (
+                SELECT *,
+                       SUM(total_due + open_sales) OVER (PARTITION BY credit_limit_id) AS partner_exposure,
+                       ROW_NUMBER() OVER (PARTITION BY credit_limit_id ORDER BY company_id) AS rn
+                  FROM per_company
+            )
+            SELECT ROW_NUMBER() OVER (ORDER BY credit_limit_id, company_id) AS id,
+                   credit_limit_id,
+                   partner_id,
+                   company_id,
+                   currency_id,
+                   CASE WHEN rn = 1 THEN credit_limit ELSE 0 END AS credit_limit,
+                   total_due,
+                   open_sales,
+                   total_due + open_sales AS total_exposure,
+                   CASE WHEN rn = 1 THEN credit_limit - partner_exposure ELSE 0 END AS headroom,
+                   CASE WHEN credit_limit > 0 THEN 100 * partner_exposure / credit_limit ELSE 0 END AS utilization
+              FROM ranked
+            """
+        )
+
+    def init(self):
+        tools.drop_view_if_exists(self.env.cr, self._table)
+        self.env.cr.execute(SQL("CREATE OR REPLACE VIEW %s AS (%s)", SQL.identifier(self._table), self._query()))
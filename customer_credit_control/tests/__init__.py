@@ -0,0 +1,2 @@
+from . import test_credit_benchmark
+from . import test_credit_concurrency
@@ -0,0 +1,136 @@
+import logging
+import time
+from contextlib import contextmanager
+
+from odoo import Command
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+from odoo.tests import tagged
+
+_logger = logging.getLogger(__name__)
+
+CHECK_BUDGET = 12
+AVAILABLE_CREDIT_BUDGET = 14
+# Limiti bor mijoz amali limiti yo'q mijoznikidan ko'pi bilan shuncha so'rov qimmat
+CREDIT_OVERHEAD_BUDGET = 10
+
+
+@tagged('post_install', '-at_install', 'benchmark')
+class TestCreditBenchmark(AccountTestInvoicingCommon):
+    """SQL so'rovlar byudjeti va vaqti; mavjud (populate qilingan) ma'lumotlar ustida ham ishlaydi.
+
+    Standart Odoo qismi o'rnatilgan modullarga bog'liq, shuning uchun satr va tasdiqlash
+    amallari limiti yo'q mijozdagi xuddi shu amal bilan solishtiriladi.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env = cls.env(context=dict(cls.env.context, tracking_disable=True))
+        cls.partners = cls.env['res.partner'].create([
+            {'name': f'Kredit Benchmark Mijoz {index}', 'is_company': True} for index in range(20)
+        ])
+        cls.free_partners = cls.env['res.partner'].create([
+            {'name': f'Kredit Benchmark Limitsiz Mijoz {index}', 'is_company': True} for index in range(10)
+        ])
+        cls.env['customer.credit.limit'].create([
+            {'partner_id': partner.id, 'credit_limit': 1000000000.0} for partner in cls.partners
+        ])
+        for partner in cls.partners[:10]:
+            cls.init_invoice('out_invoice', partner=partner, amounts=[500.0], post=True)
+        cls.orders = cls._create_orders(cls.partners, 4)
+        cls.free_orders = cls._create_orders(cls.free_partners, 2)
+        (cls.orders[::2] | cls.free_orders[::2]).action_confirm()
+        cls.env['customer.credit.exposure']._run_deferred_refresh()
+
+    @classmethod
+    def _create_orders(cls, partners, per_partner):
+        return cls.env['sale.order'].create([
+            {
+                'partner_id': partner.id,
+                'order_line': [Command.create({
+                    'product_id': cls.product_a.id,
+                    'product_uom_qty': 2,
+                    'price_unit': 100.0,
+                })],
+            }
+            for partner in partners
+            for __ in range(per_partner)
+        ])
+
+    def _reset_caches(self):
+        self.env['customer.credit.exposure']._run_deferred_refresh()
+        self.env.flush_all()
+        self.env.invalidate_all()
+        self.env.cr.cache.clear()
+
+    @contextmanager
+    def _benchmark(self, label):
+        """Blok so'rovlari sonini ``result['queries']`` ga yozish, vaqt bilan logga chiqarish"""
+        self._reset_caches()
+        cr = self.env.cr
+        result = {}
+        start_queries = cr.sql_log_count
+        start = time.perf_counter()
+        yield result
+        self.env.flush_all()
+        result['queries'] = cr.sql_log_count - start_queries
+        _logger.info("%s: %s queries, %.1f ms", label, result['queries'], (time.perf_counter() - start) * 1000)
+
+    def _create_line(self, order):
+        line = self.env['sale.order.line'].create({
+            'order_id': order.id,
+            'product_id': self.product_a.id,
+            'product_uom_qty': 1,
+            'price_unit': 100.0,
+        })
+        self.env.cr.precommit.run()
+        return line
+
+    def _write_line(self, line):
+        line.product_uom_qty = 3
+        self.env.cr.precommit.run()
+
+    def _confirm(self, orders):
+        orders.action_confirm()
+        self.env.cr.precommit.run()
+
+    def test_credit_check_query_count(self):
+        with self._benchmark("credit check") as result:
+            self.orders[1]._check_credit_limit_restriction()
+        self.assertLessEqual(result['queries'], CHECK_BUDGET)
+
+    def test_available_credit_list_query_count(self):
+        """Ro'yxat o'lchamidan qat'i nazar so'rovlar soni bir xil"""
+        for orders in (self.orders[:8], self.orders):
+            with self._benchmark(f"available_credit of {len(orders)} orders") as result:
+                orders.mapped('available_credit')
+            self.assertLessEqual(result['queries'], AVAILABLE_CREDIT_BUDGET)
+
+    def test_line_create_write_query_count(self):
+        self._write_line(self._create_line(self.free_orders[2]))
+        results = {}
+        for key, order in (('limit', self.orders[0]), ('free', self.free_orders[0])):
+            with self._benchmark(f"order line create ({key})") as results[key, 'create']:
+                line = self._create_line(order)
+            with self._benchmark(f"order line write ({key})") as results[key, 'write']:
+                self._write_line(line)
+        for operation in ('create', 'write'):
+            self.assertLessEqual(
+                results['limit', operation]['queries'] - results['free', operation]['queries'],
+                CREDIT_OVERHEAD_BUDGET,
+            )
+
+    def test_action_confirm_query_count(self):
+        """Bitta va 8 ta (turli mijozlar) buyurtma tasdiqlashda qo'shimcha so'rovlar bir xil"""
+        self._confirm(self.free_orders[17])
+        cases = [
+            (self.orders[3], self.free_orders[19]),
+            (self.orders[1::4][:8], self.free_orders[1:17:2]),
+        ]
+        for limited_orders, free_orders in cases:
+            with self._benchmark(f"action_confirm of {len(limited_orders)} orders (limit)") as limited:
+                self._confirm(limited_orders)
+            with self._benchmark(f"action_confirm of {len(free_orders)} orders (free)") as free:
+                self._confirm(free_orders)
+            self.assertEqual(set((limited_orders | free_orders).mapped('state')), {'sale'})
+            self.assertLessEqual(limited['queries'] - free['queries'], CREDIT_OVERHEAD_BUDGET)
@@ -0,0 +1,143 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from odoo import api, Command, SUPERUSER_ID
+from odoo.exceptions import ValidationError
+from odoo.modules.registry import Registry
+from odoo.service.model import retrying
+from odoo.tests import BaseCase, get_db_name, tagged
+from odoo.tools import SQL
+
+_logger = logging.getLogger(__name__)
+
+PARALLEL_PARTNERS = 8
+
+
+@tagged('post_install', '-at_install')
+class TestCreditLockConcurrency(BaseCase):
+    """Har bir tranzaksiya o'z ``registry.cursor()`` ida ishlaydi va haqiqatan commit qiladi.
+
+    Limit soliqsiz 100 lik buyurtmalardan faqat bittasini sig'diradi.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.registry = Registry(get_db_name())
+        with cls.environment() as env:
+            product = env['product.product'].create({
+                'name': 'Kredit Parallel Mahsulot',
+                'list_price': 100.0,
+                'taxes_id': [Command.clear()],
+            })
+            partners = env['res.partner'].create([
+                {'name': f'Kredit Parallel Mijoz {index}', 'is_company': True}
+                for index in range(PARALLEL_PARTNERS + 3)
+            ])
+            env['customer.credit.limit'].create([
+                {'partner_id': partner.id, 'credit_limit': 150.0} for partner in partners
+            ])
+            orders = env['sale.order'].create([
+                {
+                    'partner_id': partner.id,
+                    'order_line': [Command.create({
+                        'product_id': product.id,
+                        'product_uom_qty': 1,
+                        'price_unit': 100.0,
+                        'tax_ids': [Command.clear()],
+                    })],
+                }
+                for partner in partners[:1] + partners
+            ])
+            env['customer.credit.exposure']._lock({(partner.id, env.company.id) for partner in partners})
+            cls.product_id = product.id
+            cls.partner_ids = partners.ids
+            cls.order_ids = orders.ids
+        cls.addClassCleanup(cls._cleanup)
+
+    @classmethod
+    def _cleanup(cls):
+        with cls.environment() as env:
+            orders = env['sale.order'].browse(cls.order_ids).exists()
+            orders.filtered(lambda o: o.state == 'sale')._action_cancel()
+            orders.unlink()
+            env['res.partner'].browse(cls.partner_ids).unlink()
+            env['product.product'].browse(cls.product_id).unlink()
+
+    @classmethod
+    @contextmanager
+    def environment(cls):
+        with cls.registry.cursor() as cr:
+            yield api.Environment(cr, SUPERUSER_ID, {'tracking_disable': True})
+
+    def _confirm(self, order_id, barrier, outcomes):
+        """RPC kabi: serialization xatosida ``retrying`` tranzaksiyani qaytadan bajaradi"""
+        attempts = []
+
+        def confirm():
+            attempts.append(order_id)
+            order = env['sale.order'].browse(order_id)
+            if len(attempts) == 1:
+                order.read(['state'])
+                barrier.wait(timeout=10)
+            order.action_confirm()
+
+        try:
+            with self.environment() as env:
+                env.cr._default_log_exceptions = False
+                retrying(confirm, env)
+            outcome = 'commit'
+        except ValidationError:
+            outcome = 'credit_limit'
+        outcomes[order_id] = (outcome, len(attempts))
+
+    def _run_parallel(self, order_ids):
+        barrier = threading.Barrier(len(order_ids))
+        outcomes = {}
+        threads = [
+            threading.Thread(target=self._confirm, args=(order_id, barrier, outcomes))
+            for order_id in order_ids
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=60)
+        return outcomes, time.perf_counter() - start
+
+    def test_same_partner_retry_hits_credit_limit(self):
+        """Bir mijozning ikki buyurtmasi: biri commit, ikkinchisi qayta urinishda limitga uriladi"""
+        order_ids = self.order_ids[:2]
+        outcomes, __ = self._run_parallel(order_ids)
+
+        self.assertEqual(sorted(outcomes.values()), [('commit', 1), ('credit_limit', 2)])
+        with self.environment() as env:
+            states = env['sale.order'].browse(order_ids).mapped('state')
+        self.assertEqual(sorted(states), ['draft', 'sale'])
+
+    def test_distinct_partners_no_serialization_failure(self):
+        """Turli mijozlar buyurtmalari parallel tasdiqlanganda qayta urinish bo'lmaydi"""
+        order_ids = self.order_ids[-PARALLEL_PARTNERS:]
+        outcomes, wall_time = self._run_parallel(order_ids)
+        _logger.info("Confirmed %d orders of distinct partners in parallel: %.3fs", len(order_ids), wall_time)
+
+        self.assertEqual(outcomes, dict.fromkeys(order_ids, ('commit', 1)))
+        with self.environment() as env:
+            states = env['sale.order'].browse(order_ids).mapped('state')
+        self.assertEqual(states, ['sale'] * PARALLEL_PARTNERS)
+
+    def test_different_partners_do_not_block(self):
+        """Boshqa mijozning qulfi ochiq turganda ham tasdiqlash kutmasdan commit bo'ladi"""
+        order_b, order_c = self.order_ids[2:4]
+        with self.environment() as env0:
+            env0['sale.order'].browse(order_b)._lock_credit_exposure()
+            with self.environment() as env1:
+                env1.cr._default_log_exceptions = False
+                env1.cr.execute(SQL("SET LOCAL lock_timeout = '2s'"))
+                env1['sale.order'].browse(order_c).action_confirm()
+            env0['sale.order'].browse(order_b).action_confirm()
+
+        with self.environment() as env:
+            self.assertEqual(env['sale.order'].browse([order_b, order_c]).mapped('state'), ['sale', 'sale'])
@@ -1,15 +1,20 @@
 {
     'name': 'Sale Approval',
-    'version': '1.0',
+    'version': '1.1',
     'category': 'Sales',
     'summary': 'Buyuk buyurtmalar uchun tasdiqlash tizimi',
     'author': 'Your Company',
     'depends': ['base', 'sale', 'mail'],
     'data': [
         'data/sale_approval_sequence.xml',
+        'data/ir_cron_data.xml',
         'security/ir.model.access.csv',
         'security/record_rules.xml',
+        'data/sale_approval_rule_data.xml',
         'views/approval_request_views.xml',
+        'views/approval_rule_views.xml',
+        'views/approval_perf_sample_views.xml',
+        'report/approval_report_views.xml',
     ],
     'installable': True,
     'application': True,
@@ -0,0 +1,6 @@
+from odoo import api, SUPERUSER_ID
+
+
+def migrate(cr, version):
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    env['sale.approval.request']._backfill_state_dates()
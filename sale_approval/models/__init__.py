@@ -1 +1,4 @@
+from . import approval_perf_sample
 from . import approval_request
+from . import approval_audit
+from . import approval_rule
@@ -0,0 +1,26 @@
+from odoo import models, fields, _
+from odoo.exceptions import UserError
+
+from .approval_request import STATE_SELECTION
+
+
+class SaleApprovalAudit(models.Model):
+    _name = 'sale.approval.audit'
+    _description = 'Tasdiqlash So\'rovi Audit Jurnali'
+    _order = 'date desc, id desc'
+    _rec_name = 'request_id'
+    _log_access = False
+
+    request_id = fields.Many2one('sale.approval.request', string='Tasdiqlash So\'rovi',
+                                 required=True, readonly=True, ondelete='cascade')
+    from_state = fields.Selection(STATE_SELECTION, string='Oldingi Holat', readonly=True)
+    to_state = fields.Selection(STATE_SELECTION, string='Yangi Holat', required=True, readonly=True)
+    user_id = fields.Many2one('res.users', string='Foydalanuvchi', readonly=True, ondelete='set null')
+    date = fields.Datetime(string='Vaqt', required=True, readonly=True, default=fields.Datetime.now)
+    reason = fields.Text(string='Sabab', readonly=True)
+
+    _request_date_idx = models.Index('(request_id, date)')
+    _decision_idx = models.Index("(request_id, date DESC, id DESC) WHERE to_state IN ('approved', 'rejected')")
+
+    def write(self, vals):
+        raise UserError(_("Audit yozuvlarini o'zgartirib bo'lmaydi."))
@@ -0,0 +1,87 @@
+import functools
+import logging
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+import psycopg2
+
+from odoo import models, fields, api
+from odoo.tools import SQL, str2bool
+
+_logger = logging.getLogger(__name__)
+
+RETENTION_DAYS = 30
+
+
+def instrumented(operation):
+    """``action_*`` metodlari uchun: chaqiruvni ``sale.approval.perf.sample`` ga yozadi"""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            Sample = self.env['sale.approval.perf.sample']
+            slow_ms = Sample._get_slow_threshold()
+            if slow_ms is None:
+                return method(self, *args, **kwargs)
+            with Sample._measure(operation, slow_ms, self):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class SaleApprovalPerfSample(models.Model):
+    _name = 'sale.approval.perf.sample'
+    _description = 'Tasdiqlash Unumdorlik Namunasi'
+    _order = 'date desc, id desc'
+    _rec_name = 'operation'
+    _log_access = False
+
+    date = fields.Datetime(string='Vaqt', readonly=True, default=fields.Datetime.now, index=True)
+    operation = fields.Char(string='Amaliyot', readonly=True)
+    partner_id = fields.Many2one('res.partner', string='Mijoz', readonly=True, ondelete='set null')
+    user_id = fields.Many2one('res.users', string='Foydalanuvchi', readonly=True, ondelete='set null')
+    request_count = fields.Integer(string="So'rovlar Soni", readonly=True, aggregator='avg')
+    duration = fields.Float(string='Davomiyligi (ms)', readonly=True, aggregator='avg')
+    query_count = fields.Integer(string="SQL So'rovlar", readonly=True, aggregator='avg')
+
+    @api.model
+    def _get_slow_threshold(self):
+        ICP = self.env['ir.config_parameter'].sudo()
+        if not str2bool(ICP.get_param('sale_approval.instrumentation', 'False')):
+            return None
+        return float(ICP.get_param('sale_approval.instrumentation_slow_ms', 100))
+
+    @contextmanager
+    def _measure(self, operation, slow_ms, requests):
+        cr = self.env.cr
+        start_queries = cr.sql_log_count
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = (time.perf_counter() - start) * 1000
+            if duration >= slow_ms:
+                partner = requests.sale_order_id.partner_id.commercial_partner_id
+                self._record({
+                    'operation': operation,
+                    'partner_id': partner.id if len(partner) == 1 else False,
+                    'user_id': self.env.uid,
+                    'request_count': len(requests),
+                    'duration': duration,
+                    'query_count': cr.sql_log_count - start_queries,
+                })
+
+    @api.model
+    def _record(self, vals):
+        try:
+            with self.env.registry.cursor() as cr:
+                self.env(cr=cr, su=True)[self._name].create(vals)
+        except psycopg2.Error:
+            _logger.warning("Could not record approval performance sample %s", vals['operation'], exc_info=True)
+
+    @api.autovacuum
+    def _gc_samples(self):
+        self.env.cr.execute(SQL(
+            "DELETE FROM sale_approval_perf_sample WHERE date < %s",
+            fields.Datetime.now() - timedelta(days=RETENTION_DAYS),
+        ))
@@ -1,5 +1,24 @@
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
 from odoo import models, fields, api, _
-from odoo.exceptions import ValidationError, AccessError
+from odoo.exceptions import UserError, ValidationError, AccessError
+from odoo.tools import SQL, split_every
+
+from .approval_perf_sample import instrumented
+
+_logger = logging.getLogger(__name__)
+
+APPROVAL_BATCH_SIZE = 200
+DIGEST_LINE_LIMIT = 50
+
+STATE_SELECTION = [
+    ('draft', 'Taslagi'),
+    ('submitted', 'Yuborildi'),
+    ('approved', 'Tasdiqlandi'),
+    ('rejected', 'Rad Etildi'),
+]
 
 
 class SaleApprovalRequest(models.Model):
@@ -8,8 +27,8 @@ class SaleApprovalRequest(models.Model):
     _order = 'create_date desc'
     _inherit = ['mail.thread', 'mail.activity.mixin']
 
-    name = fields.Char(string='Nomi', required=True, readonly=True, 
-                       default=lambda self: self.env['ir.sequence'].next_by_code('sale.approval.request'))
+    name = fields.Char(string='Nomi', required=True, readonly=True, copy=False,
+                       default=lambda self: _('New'))
     sale_order_id = fields.Many2one('sale.order', string='Sotish Buyurtmasi', 
                                      required=True, ondelete='cascade')
     requested_by = fields.Many2one('res.users', string='So\'rov Qilgan', 
@@ -17,16 +36,24 @@ class SaleApprovalRequest(models.Model):
                                     default=lambda self: self.env.user)
     approved_by = fields.Many2one('res.users', string='Tasdiqlagan')
     rejection_reason = fields.Text(string='Rad Etish Sababi')
-    state = fields.Selection([
-        ('draft', 'Taslagi'),
-        ('submitted', 'Yuborildi'),
-        ('approved', 'Tasdiqlandi'),
-        ('rejected', 'Rad Etildi'),
-    ], string='Holati', default='draft', tracking=True)
+    state = fields.Selection(STATE_SELECTION, string='Holati', default='draft', tracking=True)
     total_amount = fields.Monetary(string='Jami Summa', compute='_compute_total_amount', store=True)
     currency_id = fields.Many2one('res.currency', string='Valyuta',
                                    default=lambda self: self.env.company.currency_id)
     approval_date = fields.Datetime(string='Tasdiqlash Vaqti', readonly=True)
+    rule_id = fields.Many2one('sale.approval.rule', string='Tasdiqlash Qoidasi', readonly=True)
+    approval_level = fields.Integer(string='Tasdiqlangan Bosqichlar', readonly=True, copy=False)
+    level_count = fields.Integer(string='Bosqichlar Soni', compute='_compute_level_count')
+    manager_notified = fields.Boolean(string='Menejerlarga Xabar Berildi', readonly=True, copy=False)
+    submit_date = fields.Datetime(string='Yuborilgan Vaqt', readonly=True, copy=False)
+    decision_date = fields.Datetime(string='Qaror Vaqti', readonly=True, copy=False)
+    sla_deadline = fields.Datetime(string='SLA Muddati', readonly=True, copy=False,
+                                   help="Muddat o'tsa so'rov eskalatsiya qilinadi va muddat yana SLA ga suriladi")
+    escalation_level = fields.Integer(string='Eskalatsiyalar Soni', readonly=True, copy=False)
+    audit_ids = fields.One2many('sale.approval.audit', 'request_id', string='Audit Tarixi', readonly=True)
+
+    _sla_deadline_idx = models.Index('(state, sla_deadline)')
+    _submit_date_idx = models.Index('(submit_date) WHERE submit_date IS NOT NULL')
 
     _sale_order_unique = models.Constraint(
         'UNIQUE(sale_order_id)',
@@ -35,10 +62,11 @@ class SaleApprovalRequest(models.Model):
 
     @api.model_create_multi
     def create(self, vals_list):
-        is_manager = self.env.user.has_group('sales_team.group_sale_manager')
+        is_manager = self.env.su or self.env.user.has_group('sales_team.group_sale_manager')
+        unnamed = [vals for vals in vals_list if not vals.get('name') or vals['name'] == _('New')]
+        for vals, name in zip(unnamed, self._allocate_names(len(unnamed))):
+            vals['name'] = name
         for vals in vals_list:
-            if not vals.get('name'):
-                vals['name'] = self.env['ir.sequence'].next_by_code('sale.approval.request') or '/'
             if not is_manager:
                 vals['requested_by'] = self.env.user.id
                 vals.pop('approved_by', None)
@@ -48,7 +76,7 @@ class SaleApprovalRequest(models.Model):
         return super().create(vals_list)
 
     def write(self, vals):
-        if not self.env.user.has_group('sales_team.group_sale_manager'):
+        if not self.env.su and not self.env.user.has_group('sales_team.group_sale_manager'):
             allowed_fields = {'state'}
             if set(vals) - allowed_fields:
                 raise AccessError(_("Oddiy user faqat submit (state) amalini bajarishi mumkin."))
@@ -60,6 +88,45 @@ class SaleApprovalRequest(models.Model):
                     raise ValidationError(_("Faqat draft so'rovni submit qilish mumkin."))
         return super().write(vals)
 
+    @api.model
+    def _allocate_names(self, count):
+        """``count`` ta ketma-ket nomni bitta so'rov bilan band qilish.
+
+        Ketma-ketlik ``next_by_code`` kabi tanlanadi; sana oraliqli ketma-ketliklar
+        uchun odatdagi ``next_by_code`` ishlatiladi.
+        """
+        if not count:
+            return []
+        sequence = self.env['ir.sequence'].sudo().search([
+            ('code', '=', 'sale.approval.request'),
+            ('company_id', 'in', [self.env.company.id, False]),
+        ], order='company_id', limit=1)
+        if not sequence:
+            return ['/'] * count
+        if sequence.use_date_range:
+            return [sequence._next() for __ in range(count)]
+
+        if sequence.implementation == 'standard':
+            self.env.cr.execute(SQL(
+                "SELECT nextval(%s) FROM generate_series(1, %s)",
+                f'ir_sequence_{sequence.id:03d}', count,
+            ))
+            numbers = sorted(number for number, in self.env.cr.fetchall())
+        else:
+            self.env.cr.execute(SQL(
+                """
+                UPDATE ir_sequence
+                   SET number_next = number_next + %s * number_increment
+                 WHERE id = %s
+             RETURNING number_next - %s * number_increment, number_increment
+                """,
+                count, sequence.id, count,
+            ))
+            first, step = self.env.cr.fetchone()
+            sequence.invalidate_recordset(['number_next'])
+            numbers = [first + i * step for i in range(count)]
+        return [sequence.get_next_char(number) for number in numbers]
+
     @api.depends('sale_order_id.amount_total')
     def _compute_total_amount(self):
         for request in self:
@@ -68,35 +135,59 @@ class SaleApprovalRequest(models.Model):
             else:
                 request.total_amount = 0
 
+    @api.depends('rule_id')
+    def _compute_level_count(self):
+        Rule = self.env['sale.approval.rule']
+        for request in self:
+            request.level_count = len(Rule._get_level_group_ids(request.rule_id.id))
+
+    def _get_next_level_group_id(self):
+        self.ensure_one()
+        group_ids = self.env['sale.approval.rule']._get_level_group_ids(self.rule_id.id)
+        return group_ids[min(self.approval_level, len(group_ids) - 1)]
+
+    @instrumented('submit')
     def action_submit(self):
         """So'rovni yuborish"""
-        for request in self:
-            if request.state != 'draft':
-                raise ValidationError('Faqat taslagi holatdagi so\'rovlarni yuborish mumkin!')
-            
-            request.write({'state': 'submitted'})
-            
-            request._send_notification_to_managers()
-    
+        if any(request.state != 'draft' for request in self):
+            raise ValidationError('Faqat taslagi holatdagi so\'rovlarni yuborish mumkin!')
+
+        audit_vals = self._prepare_audit_vals('submitted')
+        self._without_bulk_tracking().write({'state': 'submitted'})
+        self.env['sale.approval.audit'].sudo().create(audit_vals)
+        now = fields.Datetime.now()
+        for sla_hours, requests in self.grouped(lambda r: r._get_sla_hours()).items():
+            requests.sudo().write({
+                'submit_date': now,
+                'sla_deadline': now + timedelta(hours=sla_hours),
+                'escalation_level': 0,
+            })
+
+        self._send_notification_to_managers()
+
+    def _get_sla_hours(self):
+        self.ensure_one()
+        if self.rule_id.sla_hours:
+            return self.rule_id.sla_hours
+        return int(self.env['ir.config_parameter'].sudo().get_param('sale_approval.sla_hours', 24))
+
+    @instrumented('approve')
     def action_approve(self):
         """Tasdiqlash"""
         if not self.env.user.has_group('sales_team.group_sale_manager'):
             raise ValidationError(_("Faqat Sales Manager tasdiqlashi mumkin!"))
 
+        if any(request.state != 'submitted' for request in self):
+            raise ValidationError('Faqat yuborilgan so\'rovlarni tasdiqlash mumkin!')
+
+        user_group_ids = set(self.env.user.all_group_ids.ids)
         for request in self:
-            if request.state != 'submitted':
-                raise ValidationError('Faqat yuborilgan so\'rovlarni tasdiqlash mumkin!')
-            
-            request.write({
-                'state': 'approved',
-                'approved_by': self.env.user.id,
-                'approval_date': fields.Datetime.now()
-            })
-            
-            request.sale_order_id.action_confirm()
-            
-            request._send_approval_notification()
-    
+            if request._get_next_level_group_id() not in user_group_ids:
+                raise ValidationError(_("%(name)s: ushbu bosqichni tasdiqlash huquqingiz yo'q!", name=request.name))
+
+        return self._run_batch('_approve_batch', _("Tasdiqlash"))
+
+    @instrumented('reject')
     def action_reject(self):
         """Rad etish"""
         if not self.env.user.has_group('sales_team.group_sale_manager'):
@@ -108,59 +199,362 @@ class SaleApprovalRequest(models.Model):
 
             if request.state != 'submitted':
                 raise ValidationError('Faqat yuborilgan so\'rovlarni rad etish mumkin!')
-            
-            request.write({'state': 'rejected'})
-            
-            request._send_rejection_notification()
-    
+
+        return self._run_batch('_reject_batch', _("Rad etish"))
+
+    def _approve_batch(self):
+        """Bitta bo'lakni tasdiqlash.
+
+        Oxirgi bosqichdagi so'rovlar bitta write bilan tasdiqlanadi va buyurtmalari birga
+        tasdiqlanadi; qolganlari keyingi bosqichga o'tadi.
+        """
+        final = self.filtered(lambda r: r.approval_level + 1 >= r.level_count)
+        advancing = self - final
+        audit_vals = final._prepare_audit_vals('approved')
+        for level, requests in advancing.grouped('approval_level').items():
+            audit_vals += requests._prepare_audit_vals('submitted', _("%(level)s-bosqich tasdiqlandi", level=level + 1))
+            requests._without_bulk_tracking().write({'approval_level': level + 1})
+        for level, requests in final.grouped('approval_level').items():
+            requests._without_bulk_tracking().write({
+                'state': 'approved',
+                'approved_by': self.env.user.id,
+                'approval_date': fields.Datetime.now(),
+                'decision_date': fields.Datetime.now(),
+                'approval_level': level + 1,
+            })
+        self.env['sale.approval.audit'].sudo().create(audit_vals)
+        advancing._notify_next_level()
+
+        if not final:
+            return
+        final.sale_order_id.action_confirm()
+        final._send_approval_notification()
+
+    def _reject_batch(self):
+        """Bitta bo'lakni rad etish"""
+        audit_vals = self._prepare_audit_vals('rejected')
+        self._without_bulk_tracking().write({'state': 'rejected', 'decision_date': fields.Datetime.now()})
+        self.env['sale.approval.audit'].sudo().create(audit_vals)
+        self._send_rejection_notification()
+
+    @api.model
+    def _can_commit(self):
+        """Bo'laklar orasida commit qilish mumkinmi (testlarda yo'q)"""
+        return not self.env.registry.in_test_mode()
+
+    def _run_batch(self, method_name, operation):
+        """So'rovlarni bo'laklab qayta ishlash.
+
+        Bitta so'rov bo'lsa xato odatdagidek ko'tariladi. Ko'p so'rovda har bir bo'lak
+        savepoint ichida bajariladi; bo'lak xato bersa, uning so'rovlari alohida
+        qayta uriniladi va xatolar yig'iladi. Katta tanlovlarda har bo'lakdan keyin commit.
+        """
+        if len(self) <= 1:
+            getattr(self, method_name)()
+            return True
+
+        auto_commit = len(self) > APPROVAL_BATCH_SIZE and self._can_commit()
+        failures = {}
+        for chunk in split_every(APPROVAL_BATCH_SIZE, self.ids, self.browse):
+            try:
+                with self.env.cr.savepoint():
+                    getattr(chunk, method_name)()
+            except UserError:
+                for request in chunk:
+                    try:
+                        with self.env.cr.savepoint():
+                            getattr(request, method_name)()
+                    except UserError as e:
+                        failures[request.name] = e.args[0] if e.args else str(e)
+            if auto_commit:
+                self.env.cr.commit()
+
+        if not failures:
+            return True
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _("%(operation)s: %(failed)s ta so'rov bajarilmadi", operation=operation, failed=len(failures)),
+                'message': "\n".join(f"{name}: {error}" for name, error in failures.items()),
+                'type': 'warning',
+                'sticky': True,
+                'next': {'type': 'ir.actions.client', 'tag': 'soft_reload'},
+            },
+        }
+
+    @instrumented('draft')
     def action_draft(self):
         """Taslagi holatiga qaytarish"""
         if not self.env.user.has_group('sales_team.group_sale_manager'):
             raise ValidationError(_("Faqat Sales Manager holatni qaytarishi mumkin!"))
 
-        for request in self:
-            if request.state not in ['rejected', 'submitted']:
-                raise ValidationError('Faqat rad etilgan yoki yuborilgan so\'rovlarni taslagi holatiga qaytarish mumkin!')
-            
-            request.write({
-                'state': 'draft',
-                'rejection_reason': '',
-                'approved_by': False,
-                'approval_date': False
-            })
-    
+        if any(request.state not in ['rejected', 'submitted'] for request in self):
+            raise ValidationError('Faqat rad etilgan yoki yuborilgan so\'rovlarni taslagi holatiga qaytarish mumkin!')
+
+        audit_vals = self._prepare_audit_vals('draft')
+        self._without_bulk_tracking().write({
+            'state': 'draft',
+            'rejection_reason': '',
+            'approved_by': False,
+            'approval_date': False,
+            'approval_level': 0,
+            'manager_notified': False,
+            'submit_date': False,
+            'decision_date': False,
+            'sla_deadline': False,
+            'escalation_level': 0,
+        })
+        self.env['sale.approval.audit'].sudo().create(audit_vals)
+
+    def _without_bulk_tracking(self):
+        """Ko'p so'rovli o'tishlarda chatter tracking o'chiriladi, tarix audit jurnalida qoladi"""
+        return self.with_context(tracking_disable=True) if len(self) > 1 else self
+
+    def _prepare_audit_vals(self, to_state, reason=None):
+        """Holat o'zgarishidan oldin audit qiymatlari (bitta create bilan yoziladi)"""
+        now = fields.Datetime.now()
+        return [{
+            'request_id': request.id,
+            'from_state': request.state,
+            'to_state': to_state,
+            'user_id': self.env.uid,
+            'date': now,
+            'reason': reason or (request.rejection_reason if to_state == 'rejected' else False),
+        } for request in self]
+
+    @api.model
+    def _backfill_state_dates(self):
+        """``submit_date``/``decision_date`` bo'sh so'rovlarni ``state`` tracking tarixidan to'ldirish.
+
+        Tracking qiymati tanlov yorlig'i sifatida (o'rnatilgan tillarda) saqlanadi; oxirgi
+        yuborish va oxirgi qaror xabari vaqti olinadi. Tarixi yo'q yuborilgan so'rov
+        uchun yaratilgan vaqt ishlatiladi.
+        """
+        field = self._fields['state']
+        labels = defaultdict(set)
+        for lang, __ in self.env['res.lang'].get_installed():
+            for value, label in field._description_selection(self.with_context(lang=lang).env):
+                labels[value].update((value, label))
+        self.env.cr.execute(SQL(
+            """
+            WITH tracked AS (
+                SELECT m.res_id,
+                       MAX(m.date) FILTER (WHERE v.new_value_char IN %s) AS submit_date,
+                       MAX(m.date) FILTER (WHERE v.new_value_char IN %s) AS decision_date
+                  FROM mail_tracking_value v
+                  JOIN mail_message m ON m.id = v.mail_message_id
+                  JOIN ir_model_fields f ON f.id = v.field_id
+                 WHERE m.model = %s
+                   AND f.model = %s
+                   AND f.name = 'state'
+              GROUP BY m.res_id
+            )
+            UPDATE sale_approval_request r
+               SET submit_date = COALESCE(r.submit_date, t.submit_date, r.create_date),
+                   decision_date = CASE WHEN r.state IN ('approved', 'rejected')
+                                        THEN COALESCE(r.decision_date, t.decision_date)
+                                   END
+              FROM sale_approval_request src
+         LEFT JOIN tracked t ON t.res_id = src.id
+             WHERE r.id = src.id
+               AND r.state != 'draft'
+               AND (r.submit_date IS NULL
+                    OR (r.decision_date IS NULL AND r.state IN ('approved', 'rejected')))
+            """,
+            tuple(labels['submitted']),
+            tuple(labels['approved'] | labels['rejected']),
+            self._name, self._name,
+        ))
+        _logger.info("Backfilled submit/decision dates of %s approval requests", self.env.cr.rowcount)
+        self.invalidate_model(['submit_date', 'decision_date'])
+
+    def _get_recipients(self):
+        """Keyingi bosqich guruhi bo'yicha: guruh id -> (so'rovlar, tasdiqlovchilar partner id lari)"""
+        return {
+            group_id: (requests, self.env['res.groups'].browse(group_id).sudo().user_ids.partner_id.ids)
+            for group_id, requests in self.grouped(lambda r: r._get_next_level_group_id()).items()
+        }
+
+    def _get_manager_notification_mode(self):
+        """``instant`` (har bir so'rov uchun darhol) yoki ``digest`` (cron orqali yig'ma xabar)"""
+        return self.env['ir.config_parameter'].sudo().get_param(
+            'sale_approval.manager_notification_mode', 'instant',
+        )
+
     def _send_notification_to_managers(self):
-        """Menejerlarni notifikatsiya qilish"""
-        managers_group = self.env.ref('sales_team.group_sale_manager', raise_if_not_found=False)
-        managers = managers_group.user_ids if managers_group else self.env['res.users']
-        
-        for manager in managers:
-            if manager.partner_id:
-                self.message_notify(
-                    partner_ids=[manager.partner_id.id],
-                    body=f"Yangi sotish tasdiqlash so'rovi: {self.name}<br/>"
-                         f"Buyurtma: {self.sale_order_id.name}<br/>"
-                         f"Summa: {self.total_amount} {self.currency_id.name}<br/>"
-                         f"So'rov Qilgan: {self.requested_by.name}",
-                    subject=f"Tasdiqlash So'rovi: {self.name}"
+        """Keyingi bosqich tasdiqlovchilarini notifikatsiya qilish: har bir so'rov uchun bitta xabar"""
+        if not self or self._get_manager_notification_mode() == 'digest':
+            return
+        for requests, partner_ids in self._get_recipients().values():
+            if not partner_ids:
+                continue
+            for request in requests:
+                request.message_notify(
+                    partner_ids=partner_ids,
+                    body=f"Yangi sotish tasdiqlash so'rovi: {request.name}<br/>"
+                         f"Buyurtma: {request.sale_order_id.name}<br/>"
+                         f"Summa: {request.total_amount} {request.currency_id.name}<br/>"
+                         f"So'rov Qilgan: {request.requested_by.name}",
+                    subject=f"Tasdiqlash So'rovi: {request.name}"
+                )
+        self.sudo().write({'manager_notified': True})
+
+    @api.model
+    def _cron_send_manager_digest(self, batch_size=APPROVAL_BATCH_SIZE):
+        """Digest rejimida har bir keyingi bosqich guruhiga ishga tushish uchun bitta yig'ma xabar.
+
+        Hali xabar berilmagan so'rovlar bo'laklab o'qiladi; xabarda soni va ko'pi bilan
+        ``DIGEST_LINE_LIMIT`` ta qator bo'ladi. Xabarlar yuborilgach barcha so'rovlar belgilanadi.
+        """
+        if self._get_manager_notification_mode() != 'digest':
+            return
+        digests = {}
+        notified_ids = []
+        last_id = 0
+        while True:
+            new_requests = self.search([
+                ('state', '=', 'submitted'),
+                ('manager_notified', '=', False),
+                ('id', '>', last_id),
+            ], order='id', limit=batch_size)
+            if not new_requests:
+                break
+            last_id = new_requests[-1].id
+            notified_ids += new_requests.ids
+            for group_id, (requests, partner_ids) in new_requests._get_recipients().items():
+                digest = digests.setdefault(group_id, {'partner_ids': partner_ids, 'count': 0, 'lines': []})
+                digest['count'] += len(requests)
+                digest['lines'] += [
+                    f"{request.name}: {request.sale_order_id.name} - {request.total_amount} {request.currency_id.name}"
+                    f" ({request.requested_by.name})"
+                    for request in requests[:max(DIGEST_LINE_LIMIT - len(digest['lines']), 0)]
+                ]
+            self.env.invalidate_all()
+        if not notified_ids:
+            return
+
+        pending_count = self.search_count([('state', '=', 'submitted')])
+        for digest in digests.values():
+            if not digest['partner_ids']:
+                continue
+            lines = "<br/>".join(digest['lines'])
+            hidden = digest['count'] - len(digest['lines'])
+            if hidden:
+                lines += f"<br/>... va yana {hidden} ta"
+            self.browse().message_notify(
+                partner_ids=digest['partner_ids'],
+                body=f"Yangi tasdiqlash so'rovlari: {digest['count']} ta<br/>{lines}<br/><br/>"
+                     f"Jami kutilayotgan so'rovlar: {pending_count} ta",
+                subject=f"Tasdiqlash So'rovlari: {digest['count']} ta yangi"
+            )
+        for requests in split_every(batch_size, notified_ids, self.browse):
+            requests.sudo().write({'manager_notified': True})
+
+    def _notify_next_level(self):
+        """Keyingi bosqich tasdiqlovchilarini xabardor qilish"""
+        for requests, partner_ids in self._get_recipients().values():
+            if not partner_ids:
+                continue
+            for request in requests:
+                request.message_notify(
+                    partner_ids=partner_ids,
+                    body=f"{request.name} so'rovi {request.approval_level}/{request.level_count} bosqichda tasdiqlandi.<br/>"
+                         f"Buyurtma: {request.sale_order_id.name}<br/>"
+                         f"Summa: {request.total_amount} {request.currency_id.name}",
+                    subject=f"Tasdiqlash So'rovi: {request.name} ({request.approval_level + 1}-bosqich)"
                 )
 
+    @api.model
+    def _cron_escalate_overdue(self, batch_size=500):
+        """SLA muddati o'tgan yuborilgan so'rovlarni bo'laklab eskalatsiya qilish.
+
+        So'rovlar (state, sla_deadline) indeksi bo'yicha olinadi; eskalatsiyadan keyin
+        muddat suriladi, shuning uchun har bir bo'lak keyingi qidiruvdan chiqib ketadi.
+        """
+        auto_commit = self._can_commit()
+        now = fields.Datetime.now()
+        while True:
+            requests = self.search([
+                ('state', '=', 'submitted'),
+                ('sla_deadline', '<', now),
+            ], order='sla_deadline', limit=batch_size)
+            if not requests:
+                break
+            requests._escalate(now)
+            if auto_commit:
+                self.env.cr.commit()
+            self.env.invalidate_all()
+
+    def _escalate(self, now):
+        """Bitta bo'lak uchun faoliyatlarni bitta create bilan yaratish va muddatni surish"""
+        activity_type = self.env.ref('mail.mail_activity_data_todo', raise_if_not_found=False)
+        model_id = self.env['ir.model']._get_id(self._name)
+        users_by_group = {}
+        activity_vals = []
+        for request in self:
+            user = request.sale_order_id.team_id.user_id
+            if not user:
+                group_id = request._get_next_level_group_id()
+                if group_id not in users_by_group:
+                    users_by_group[group_id] = self.env['res.groups'].browse(group_id).sudo().user_ids[:1]
+                user = users_by_group[group_id]
+            if not user:
+                continue
+            activity_vals.append({
+                'res_model_id': model_id,
+                'res_id': request.id,
+                'activity_type_id': activity_type.id if activity_type else False,
+                'summary': _("SLA muddati o'tdi: %(name)s", name=request.name),
+                'date_deadline': now.date(),
+                'user_id': user.id,
+            })
+        self.env['mail.activity'].sudo().create(activity_vals)
+
+        for (level, sla_hours), requests in self.grouped(lambda r: (r.escalation_level, r._get_sla_hours())).items():
+            requests.sudo().write({
+                'escalation_level': level + 1,
+                'sla_deadline': now + timedelta(hours=sla_hours),
+            })
+
     def _send_approval_notification(self):
-        """Tasdiqlash notifikatsiyasi"""
-        self.message_notify(
-            partner_ids=[self.requested_by.partner_id.id] if self.requested_by.partner_id else [],
-            body=f"Sizning '{self.sale_order_id.name}' so'rovingiz {self.approved_by.name} tomonidan tasdiqlandi!",
-            subject=f"✓ Tasdiqlandi: {self.name}"
-        )
+        """Tasdiqlash notifikatsiyasi (har bir so'rov qilgan foydalanuvchiga bittadan)"""
+        for requester, requests in self.grouped('requested_by').items():
+            partner_ids = [requester.partner_id.id] if requester.partner_id else []
+            if len(requests) == 1:
+                requests.message_notify(
+                    partner_ids=partner_ids,
+                    body=f"Sizning '{requests.sale_order_id.name}' so'rovingiz {requests.approved_by.name} tomonidan tasdiqlandi!",
+                    subject=f"✓ Tasdiqlandi: {requests.name}"
+                )
+                continue
+            lines = "<br/>".join(f"{request.name}: {request.sale_order_id.name}" for request in requests)
+            self.browse().message_notify(
+                partner_ids=partner_ids,
+                body=f"Quyidagi so'rovlaringiz {self.env.user.name} tomonidan tasdiqlandi:<br/>{lines}",
+                subject=f"✓ Tasdiqlandi: {len(requests)} ta so'rov"
+            )
 
     def _send_rejection_notification(self):
-        """Rad etish notifikatsiyasi"""
-        self.message_notify(
-            partner_ids=[self.requested_by.partner_id.id] if self.requested_by.partner_id else [],
-            body=f"Sizning '{self.sale_order_id.name}' so'rovingiz rad etildi!<br/>"
-                 f"Sabab: {self.rejection_reason}",
-            subject=f"✗ Rad Etildi: {self.name}"
-        )
+        """Rad etish notifikatsiyasi (har bir so'rov qilgan foydalanuvchiga bittadan)"""
+        for requester, requests in self.grouped('requested_by').items():
+            partner_ids = [requester.partner_id.id] if requester.partner_id else []
+            if len(requests) == 1:
+                requests.message_notify(
+                    partner_ids=partner_ids,
+                    body=f"Sizning '{requests.sale_order_id.name}' so'rovingiz rad etildi!<br/>"
+                         f"Sabab: {requests.rejection_reason}",
+                    subject=f"✗ Rad Etildi: {requests.name}"
+                )
+                continue
+            lines = "<br/>".join(
+                f"{request.name}: {request.sale_order_id.name} ({request.rejection_reason})" for request in requests
+            )
+            self.browse().message_notify(
+                partner_ids=partner_ids,
+                body=f"Quyidagi so'rovlaringiz rad etildi:<br/>{lines}",
+                subject=f"✗ Rad Etildi: {len(requests)} ta so'rov"
+            )
 
 
 class SaleOrder(models.Model):
@@ -168,66 +562,119 @@ class SaleOrder(models.Model):
 
     approval_request_id = fields.Many2one('sale.approval.request', string='Tasdiqlash So\'rovi',
                                            readonly=True)
-    approval_status = fields.Selection(related='approval_request_id.state', string='Tasdiqlash Holati')
-    requires_approval = fields.Boolean(compute='_compute_requires_approval', string='Tasdiqlash Kerak')
-    approval_count = fields.Integer(compute='_compute_approval_count', string='Tasdiqlashlar Soni')
+    approval_request_ids = fields.One2many('sale.approval.request', 'sale_order_id', string='Tasdiqlash So\'rovlari')
+    approval_status = fields.Selection(related='approval_request_id.state', string='Tasdiqlash Holati',
+                                       store=True, index='btree_not_null')
+    requires_approval = fields.Boolean(compute='_compute_requires_approval', string='Tasdiqlash Kerak', store=True)
+    approval_count = fields.Integer(compute='_compute_approval_count', string='Tasdiqlashlar Soni', store=True)
 
-    @api.depends('amount_total')
+    _approval_queue_idx = models.Index(
+        "(company_id, approval_status)"
+        " WHERE requires_approval IS TRUE"
+        " AND state IN ('draft', 'sent')"
+    )
+
+    @api.depends(lambda self: [
+        'amount_total', 'currency_rate', 'company_id', 'team_id', 'partner_id.commercial_partner_id',
+    ] + (['margin_percent'] if 'margin_percent' in self._fields else []))
     def _compute_requires_approval(self):
-        """10000 dan katta buyurtmalar tasdiqlash talab qiladi"""
+        """Mos tasdiqlash qoidasi bor buyurtmalar tasdiqlash talab qiladi"""
+        rules = self._get_approval_rules()
         for order in self:
-            order.requires_approval = order.amount_total > 10000
+            order.requires_approval = bool(rules[order.id])
+
+    def _get_approval_rules(self):
+        """buyurtma id -> mos tasdiqlash qoidasi (yoki None)"""
+        return self.env['sale.approval.rule']._match_orders(self)
 
-    @api.depends('approval_request_id')
+    @api.depends('approval_request_ids')
     def _compute_approval_count(self):
         for order in self:
-            order.approval_count = self.env['sale.approval.request'].search_count([
-                ('sale_order_id', '=', order.id)
-            ])
+            order.approval_count = len(order.approval_request_ids)
+
+    def _get_approval_requests(self, rules):
+        """buyurtma -> tasdiqlash so'rovi; mavjudlari bitta search bilan olinadi,
+        yo'qlari bitta create bilan yaratiladi. Yangi yaratilganlar ham qaytariladi.
+        """
+        Request = self.env['sale.approval.request']
+        approvals = {
+            request.sale_order_id: request
+            for request in Request.search([('sale_order_id', 'in', self.ids)])
+        }
+        missing = self.filtered(lambda o: o not in approvals)
+        created = Request.create([{
+            'sale_order_id': order.id,
+            'requested_by': self.env.user.id,
+            'rule_id': rules[order.id].id,
+        } for order in missing])
+        approvals.update(zip(missing, created))
+        for order, approval in approvals.items():
+            if order.approval_request_id != approval:
+                order.approval_request_id = approval
+        return approvals, created
 
     def action_confirm(self):
-        """Buyurtmani tasdiqlash"""
-        for order in self:
-            if order.amount_total > 10000:
-                approval = self.env['sale.approval.request'].search([
-                    ('sale_order_id', '=', order.id)
-                ], limit=1)
-                
-                if not approval:
-                    approval = self.env['sale.approval.request'].create({
-                        'sale_order_id': order.id,
-                        'requested_by': self.env.user.id,
-                    })
-                    order.approval_request_id = approval.id
-                    
-                    raise ValidationError(
-                        f"⚠️ Bu buyurtma tasdiqlash talab qiladi!\n\n"
-                        f"Summa: {order.amount_total} {order.currency_id.name}\n"
-                        f"Limit: 10,000 {order.currency_id.name}\n\n"
-                        f"Tasdiqlash so'rovi ({approval.name}) yaratildi.\n"
-                        f"Iltimos, Sales Manager tasdiqlasinini kuting."
-                    )
-                
-                elif approval.state in ('draft', 'submitted'):
-                    order.approval_request_id = approval.id
-                    raise ValidationError(
-                        f"⏳ Bu buyurtma hali tasdiqlash kutmoqda!\n"
-                        f"Tasdiqlash so'rovi: {approval.name}\n"
-                        f"Iltimos, so'rovni yuboring va Sales Manager tasdiqlasinini kuting."
-                    )
-                
-                elif approval.state == 'rejected':
-                    order.approval_request_id = approval.id
-                    raise ValidationError(
-                        f"❌ Bu buyurtma rad etildi!\n"
-                        f"Sabab: {approval.rejection_reason}\n"
-                        f"Iltimos, satish jamiyatiga murojaat qiling."
-                    )
-                
-                elif approval.state == 'approved':
-                    order.approval_request_id = approval.id
-        
-        return super(SaleOrder, self).action_confirm()
+        """Buyurtmani tasdiqlash.
+
+        Bitta buyurtmada tasdiqlash kerak bo'lsa xato ko'tariladi. Bir nechta buyurtmada
+        tasdiqlanganlari va qoida talab qilmaganlari tasdiqlanadi, qolganlari to'xtatib
+        qolinadi va ular haqida xulosa qaytariladi.
+        """
+        rules = self._get_approval_rules()
+        needs_approval = self.filtered(lambda o: rules[o.id])
+        if not needs_approval:
+            return super().action_confirm()
+
+        approvals, created = needs_approval._get_approval_requests(rules)
+        held = needs_approval.filtered(lambda o: approvals[o].state != 'approved')
+        if len(self) == 1 and held:
+            approval = approvals[self]
+            if approval in created:
+                raise ValidationError(
+                    f"⚠️ Bu buyurtma tasdiqlash talab qiladi!\n\n"
+                    f"Summa: {self.amount_total} {self.currency_id.name}\n"
+                    f"Qoida: {approval.rule_id.name}\n\n"
+                    f"Tasdiqlash so'rovi ({approval.name}) yaratildi.\n"
+                    f"Iltimos, Sales Manager tasdiqlasinini kuting."
+                )
+            if approval.state == 'rejected':
+                raise ValidationError(
+                    f"❌ Bu buyurtma rad etildi!\n"
+                    f"Sabab: {approval.rejection_reason}\n"
+                    f"Iltimos, satish jamiyatiga murojaat qiling."
+                )
+            raise ValidationError(
+                f"⏳ Bu buyurtma hali tasdiqlash kutmoqda!\n"
+                f"Tasdiqlash so'rovi: {approval.name}\n"
+                f"Iltimos, so'rovni yuboring va Sales Manager tasdiqlasinini kuting."
+            )
+
+        to_confirm = self - held
+        result = super(SaleOrder, to_confirm).action_confirm() if to_confirm else True
+        if not held:
+            return result
+
+        state_labels = dict(self.env['sale.approval.request']._fields['state']._description_selection(self.env))
+        lines = [
+            f"{order.name}: {approvals[order].name} ({state_labels[approvals[order].state]})"
+            for order in held
+        ]
+        _logger.info(
+            "%s of %s sale orders held for approval (%s new requests): %s",
+            len(held), len(self), len(created), ", ".join(held.mapped('name')),
+        )
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _("%(confirmed)s ta buyurtma tasdiqlandi, %(held)s ta buyurtma tasdiqlashni kutmoqda",
+                           confirmed=len(to_confirm), held=len(held)),
+                'message': "\n".join(lines),
+                'type': 'warning',
+                'sticky': True,
+                'next': {'type': 'ir.actions.client', 'tag': 'soft_reload'},
+            },
+        }
 
     def action_view_approval_request(self):
         """Tasdiqlash so'rovini ko'rish"""
@@ -252,8 +699,9 @@ class SaleOrder(models.Model):
         """Tasdiqlash so'rovi yarating"""
         self.ensure_one()
         
-        if self.amount_total <= 10000:
-            raise ValidationError('Faqat 10000 dan katta buyurtmalar uchun tasdiqlash kerak!')
+        rule = self._get_approval_rules()[self.id]
+        if not rule:
+            raise ValidationError('Ushbu buyurtma uchun tasdiqlash qoidasi mos kelmadi!')
         
         if self.approval_request_id:
             approval = self.approval_request_id
@@ -266,6 +714,7 @@ class SaleOrder(models.Model):
                 approval = self.env['sale.approval.request'].create({
                     'sale_order_id': self.id,
                     'requested_by': self.env.user.id,
+                    'rule_id': rule.id,
                 })
             self.approval_request_id = approval.id
         
@@ -0,0 +1,205 @@
+from collections import namedtuple
+
+from odoo import models, fields, api
+from odoo.tools import SQL
+from odoo.tools.lru import LRU
+
+CompiledRule = namedtuple('CompiledRule', 'id team_id partner_ids min_amount max_margin_percent level_group_ids')
+
+# (dbname, company_id, stamp) -> CompiledRule tuple; stamp qoidalar o'zgarganda o'zgaradi
+_COMPILED_RULES = LRU(256)
+STAMP_KEY = 'sale_approval.rules_stamp'
+
+
+class SaleApprovalRule(models.Model):
+    _name = 'sale.approval.rule'
+    _description = 'Sotish Tasdiqlash Qoidasi'
+    _order = 'sequence, id'
+
+    name = fields.Char(string='Nomi', required=True)
+    sequence = fields.Integer(string='Tartib', default=10)
+    active = fields.Boolean(string='Aktiv', default=True)
+    company_id = fields.Many2one('res.company', string='Kompaniya',
+                                 help="Bo'sh bo'lsa barcha kompaniyalarga tegishli")
+    team_id = fields.Many2one('crm.team', string='Savdo Jamoasi')
+    partner_ids = fields.Many2many('res.partner', string='Mijozlar',
+                                   domain=[('is_company', '=', True)],
+                                   help="Bo'sh bo'lsa barcha mijozlarga tegishli")
+    min_amount = fields.Float(string='Minimal Summa',
+                              help="Buyurtma summasi kompaniya valyutasiga o'tkazilib solishtiriladi")
+    max_margin_percent = fields.Float(string='Maksimal Marja (%)',
+                                      help="Marja shu foizdan past bo'lsa qoida ishlaydi. 0 - marja tekshirilmaydi")
+    sla_hours = fields.Integer(string='SLA (soat)', default=24,
+                               help="So'rov shu vaqt ichida ko'rib chiqilmasa eskalatsiya qilinadi")
+    level_ids = fields.One2many('sale.approval.rule.level', 'rule_id', string='Tasdiqlash Bosqichlari')
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        rules = super().create(vals_list)
+        self._invalidate_rules_stamp()
+        rules._recompute_open_orders()
+        return rules
+
+    def write(self, vals):
+        domain = None
+        if set(vals) - {'name', 'sequence', 'level_ids', 'sla_hours'}:
+            domain = self._get_open_orders_domain()
+        result = super().write(vals)
+        self._invalidate_rules_stamp()
+        if domain is not None:
+            self._recompute_open_orders(domain)
+        return result
+
+    def unlink(self):
+        domain = self._get_open_orders_domain()
+        result = super().unlink()
+        self._invalidate_rules_stamp()
+        self.browse()._recompute_open_orders(domain)
+        return result
+
+    def _get_open_orders_domain(self):
+        """Qoidalar ta'sir qilishi mumkin bo'lgan tasdiqlanmagan buyurtmalar domeni"""
+        domains = []
+        for rule in self:
+            domain = []
+            if rule.company_id:
+                domain.append(('company_id', '=', rule.company_id.id))
+            if rule.team_id:
+                domain.append(('team_id', '=', rule.team_id.id))
+            if rule.partner_ids:
+                domain.append(('partner_id', 'child_of', rule.partner_ids.ids))
+            domains.append(['&'] * (len(domain) - 1) + domain if domain else [(1, '=', 1)])
+        if not domains:
+            return [(0, '=', 1)]
+        return ['|'] * (len(domains) - 1) + [leaf for domain in domains for leaf in domain]
+
+    def _recompute_open_orders(self, domain=None):
+        """Qoidalar o'zgarganda tegishli tasdiqlanmagan buyurtmalarning ``requires_approval`` qiymatini yangilash.
+
+        Faqat qoidaning kompaniya/jamoa/mijoz doirasidagi buyurtmalar (o'zgarishdan oldingi va keyingi) qayta hisoblanadi.
+        """
+        scope = self._get_open_orders_domain()
+        if domain is not None:
+            scope = ['|'] + domain + scope
+        orders = self.env['sale.order'].sudo().search(
+            [('state', 'in', ('draft', 'sent'))] + scope
+        )
+        self.env.add_to_compute(orders._fields['requires_approval'], orders)
+
+    @api.model
+    def _get_rules_stamp(self):
+        """Qoidalar va bosqichlar holatining belgisi (tranzaksiya davomida bir marta o'qiladi).
+
+        Qoida o'zgarsa belgi o'zgaradi va faqat shu modelning keshi eskiradi.
+        """
+        if STAMP_KEY in self.env.cr.cache:
+            return self.env.cr.cache[STAMP_KEY]
+        self.flush_model()
+        self.env['sale.approval.rule.level'].flush_model()
+        [stamp] = self.env.execute_query(SQL(
+            """SELECT (SELECT COUNT(*) FROM sale_approval_rule), (SELECT MAX(write_date) FROM sale_approval_rule),
+                      (SELECT COUNT(*) FROM sale_approval_rule_level), (SELECT MAX(write_date) FROM sale_approval_rule_level)"""
+        ))
+        cr = self.env.cr
+        cr.cache[STAMP_KEY] = stamp
+        cr.postcommit.add(self._invalidate_rules_stamp)
+        cr.postrollback.add(self._invalidate_rules_stamp)
+        return stamp
+
+    @api.model
+    def _invalidate_rules_stamp(self):
+        self.env.cr.cache.pop(STAMP_KEY, None)
+
+    @api.model
+    def _get_compiled_rules(self, company_id, stamp=None):
+        """Kompaniyaning aktiv qoidalari, tartib bo'yicha saralangan (keshlanadi)"""
+        if stamp is None:
+            stamp = self._get_rules_stamp()
+        cache_key = (self.env.cr.dbname, company_id, stamp)
+        if cache_key not in _COMPILED_RULES:
+            _COMPILED_RULES[cache_key] = self._compile_rules(company_id)
+        return _COMPILED_RULES[cache_key]
+
+    @api.model
+    def _compile_rules(self, company_id):
+        rules = self.sudo().search([('company_id', 'in', [company_id, False])])
+        manager_group = self.env.ref('sales_team.group_sale_manager')
+        return tuple(
+            CompiledRule(
+                rule.id,
+                rule.team_id.id,
+                frozenset(rule.partner_ids.ids),
+                rule.min_amount,
+                rule.max_margin_percent,
+                tuple(level.group_id.id for level in rule.level_ids) or (manager_group.id,),
+            )
+            for rule in rules
+        )
+
+    @api.model
+    def _match_orders(self, orders):
+        """buyurtma id -> birinchi mos keluvchi ``CompiledRule`` (yoki None).
+
+        Qoidalar kompaniya bo'yicha bir marta olinadi, buyurtma uchun qo'shimcha so'rov yo'q.
+        """
+        has_margin = 'margin_percent' in orders._fields
+        stamp = self._get_rules_stamp()
+        compiled = {}
+        result = {}
+        for order in orders:
+            company_id = order.company_id.id
+            if company_id not in compiled:
+                compiled[company_id] = self._get_compiled_rules(company_id, stamp)
+            amount = order.amount_total / (order.currency_rate or 1.0)
+            margin_percent = order.margin_percent * 100 if has_margin else None
+            partner_id = order.partner_id.commercial_partner_id.id
+            team_id = order.team_id.id
+            result[order.id] = next((
+                rule for rule in compiled[company_id]
+                if amount > rule.min_amount
+                and (not rule.team_id or rule.team_id == team_id)
+                and (not rule.partner_ids or partner_id in rule.partner_ids)
+                and (not rule.max_margin_percent or margin_percent is None
+                     or margin_percent < rule.max_margin_percent)
+            ), None)
+        return result
+
+    @api.model
+    def _get_level_group_ids(self, rule_id):
+        """Qoida bosqichlari uchun guruhlar; qoidasiz so'rovlar uchun bitta bosqich (Sales Manager)"""
+        if rule_id:
+            rule = self.browse(rule_id).sudo()
+            for compiled in self._get_compiled_rules(rule.company_id.id):
+                if compiled.id == rule_id:
+                    return compiled.level_group_ids
+            if rule.level_ids:
+                return tuple(level.group_id.id for level in rule.level_ids)
+        return (self.env.ref('sales_team.group_sale_manager').id,)
+
+
+class SaleApprovalRuleLevel(models.Model):
+    _name = 'sale.approval.rule.level'
+    _description = 'Sotish Tasdiqlash Bosqichi'
+    _order = 'rule_id, sequence, id'
+
+    rule_id = fields.Many2one('sale.approval.rule', string='Qoida', required=True, ondelete='cascade', index=True)
+    sequence = fields.Integer(string='Tartib', default=10)
+    name = fields.Char(string='Nomi', required=True)
+    group_id = fields.Many2one('res.groups', string='Tasdiqlovchi Guruh', required=True,
+                               default=lambda self: self.env.ref('sales_team.group_sale_manager', raise_if_not_found=False))
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        levels = super().create(vals_list)
+        self.env['sale.approval.rule']._invalidate_rules_stamp()
+        return levels
+
+    def write(self, vals):
+        result = super().write(vals)
+        self.env['sale.approval.rule']._invalidate_rules_stamp()
+        return result
+
+    def unlink(self):
+        result = super().unlink()
+        self.env['sale.approval.rule']._invalidate_rules_stamp()
+        return result
@@ -0,0 +1,2 @@
+from . import approval_rule
+from . import approval_request
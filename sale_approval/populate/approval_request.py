@@ -0,0 +1,60 @@
+from datetime import timedelta
+
+from odoo import models, fields
+from odoo.tools import populate
+
+
+class SaleApprovalRequest(models.Model):
+    _inherit = 'sale.approval.request'
+
+    # har bir buyurtmaga bitta so'rov: o'lchamlar sale.order o'lchamlaridan kichik
+    _populate_sizes = {'small': 10, 'medium': 500, 'large': 10000}
+    _populate_dependencies = ['sale.order', 'sale.approval.rule']
+
+    def _populate_factories(self):
+        order_ids = self.env.registry.populated_models['sale.order']
+        rule_ids = self.env.registry.populated_models['sale.approval.rule']
+        user_id = self.env.user.id
+        now = fields.Datetime.now()
+
+        def get_orders(iterator, *args):
+            # buyurtmalar tugasa to'xtaydi, order_ids chegarasidan chiqmaydi
+            for values, order_id in zip(iterator, order_ids):
+                values['sale_order_id'] = order_id
+                yield values
+
+        def get_dates(iterator, *args):
+            random = populate.Random('sale_approval_request_dates')
+            for values in iterator:
+                if values['state'] != 'draft':
+                    submit_date = now - timedelta(hours=random.randint(1, 24 * 90))
+                    values.update({
+                        'submit_date': submit_date,
+                        'sla_deadline': submit_date + timedelta(hours=24),
+                    })
+                if values['state'] in ('approved', 'rejected'):
+                    values['decision_date'] = values['submit_date'] + timedelta(hours=random.randint(1, 96))
+                if values['state'] == 'approved':
+                    values.update({
+                        'approved_by': user_id,
+                        'approval_date': values['decision_date'],
+                    })
+                if values['state'] == 'rejected':
+                    values['rejection_reason'] = "Populate"
+                yield values
+
+        return [
+            ('rule_id', populate.iterate(rule_ids)),
+            ('state', populate.cartesian(
+                ['draft', 'submitted', 'approved', 'rejected'],
+                [0.1, 0.4, 0.4, 0.1],
+            )),
+            ('submit_date', get_dates),
+            ('sale_order_id', get_orders),
+        ]
+
+    def _populate(self, size):
+        records = super()._populate(size)
+        for request in records:
+            request.sale_order_id.approval_request_id = request
+        return records
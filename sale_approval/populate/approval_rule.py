@@ -0,0 +1,20 @@
+from odoo import models
+from odoo.tools import populate
+
+
+class SaleApprovalRule(models.Model):
+    _inherit = 'sale.approval.rule'
+
+    _populate_sizes = {'small': 3, 'medium': 10, 'large': 50}
+    _populate_dependencies = ['crm.team']
+
+    def _populate_factories(self):
+        team_ids = self.env.registry.populated_models['crm.team']
+
+        return [
+            ('name', populate.constant('Qoida {counter}')),
+            ('sequence', populate.randint(1, 100)),
+            ('team_id', populate.iterate([False] + team_ids)),
+            ('min_amount', populate.iterate([5000, 10000, 25000, 100000])),
+            ('sla_hours', populate.iterate([8, 24, 48])),
+        ]
@@ -0,0 +1 @@
+from . import approval_report
@@ -0,0 +1,107 @@
+from odoo import models, fields, tools
+from odoo.tools import SQL
+
+
+class SaleApprovalReport(models.Model):
+    _name = 'sale.approval.report'
+    _description = 'Tasdiqlash Tahlili'
+    _auto = False
+    _order = 'month desc, team_id, approver_id'
+
+    month = fields.Date(string='Oy', readonly=True)
+    company_id = fields.Many2one('res.company', string='Kompaniya', readonly=True)
+    team_id = fields.Many2one('crm.team', string='Savdo Jamoasi', readonly=True)
+    approver_id = fields.Many2one('res.users', string='Qaror Qilgan', readonly=True)
+    approver_group_id = fields.Many2one('res.groups', string='Kutayotgan Guruh', readonly=True,
+                                        help="Kutilayotgan so'rovning keyingi bosqich tasdiqlovchi guruhi")
+    request_count = fields.Integer(string="So'rovlar", readonly=True)
+    approved_count = fields.Integer(string='Tasdiqlangan', readonly=True)
+    rejected_count = fields.Integer(string='Rad Etilgan', readonly=True)
+    decided_count = fields.Integer(string='Qaror Qilingan', readonly=True)
+    pending_count = fields.Integer(string='Kutilmoqda', readonly=True)
+    approval_rate = fields.Float(string='Tasdiqlash Ulushi (%)', readonly=True, aggregator='avg')
+    avg_hours = fields.Float(string="O'rtacha Vaqt (soat)", readonly=True, aggregator='avg')
+    median_hours = fields.Float(string='Mediana (soat)', readonly=True, aggregator='avg')
+    p95_hours = fields.Float(string='P95 (soat)', readonly=True, aggregator='max')
+
+    def _query(self):
+        """Har bir yuborilgan so'rov uchun bitta qator.
+
+        Qaror qilgan foydalanuvchi audit jurnalidagi oxirgi qaror yozuvidan olinadi;
+        kutilayotgan so'rovlar keyingi bosqich guruhiga biriktiriladi.
+        """
+        return SQL(
+            """
+            SELECT r.id,
+                   date_trunc('month', r.submit_date)::date AS month,
+                   so.company_id,
+                   so.team_id,
+                   CASE WHEN r.state IN ('approved', 'rejected')
+                        THEN COALESCE(d.user_id, r.approved_by)
+                   END AS approver_id,
+                   CASE WHEN r.state = 'submitted'
+                        THEN COALESCE(lvl.group_id, (
+                            SELECT res_id FROM ir_model_data
+                             WHERE module = 'sales_team' AND name = 'group_sale_manager'
+                        ))
+                   END AS approver_group_id,
+                   1 AS request_count,
+                   (r.state = 'approved')::int AS approved_count,
+                   (r.state = 'rejected')::int AS rejected_count,
+                   (r.state IN ('approved', 'rejected'))::int AS decided_count,
+                   (r.state = 'submitted')::int AS pending_count,
+                   CASE WHEN r.state = 'approved' THEN 100.0
+                        WHEN r.state = 'rejected' THEN 0.0
+                   END AS approval_rate,
+                   EXTRACT(EPOCH FROM r.decision_date - r.submit_date) / 3600.0 AS avg_hours,
+                   EXTRACT(EPOCH FROM r.decision_date - r.submit_date) / 3600.0 AS median_hours,
+                   EXTRACT(EPOCH FROM r.decision_date - r.submit_date) / 3600.0 AS p95_hours
+              FROM sale_approval_request r
+              JOIN sale_order so ON so.id = r.sale_order_id
+         LEFT JOIN LATERAL (
+                    SELECT a.user_id
+                      FROM sale_approval_audit a
+                     WHERE a.request_id = r.id
+                       AND a.to_state IN ('approved', 'rejected')
+                  ORDER BY a.date DESC, a.id DESC
+                     LIMIT 1
+                   ) d ON r.state IN ('approved', 'rejected')
+         LEFT JOIN LATERAL (
+                    SELECT l.group_id
+                      FROM (
+                        SELECT group_id, ROW_NUMBER() OVER (ORDER BY sequence, id) - 1 AS idx
+                          FROM sale_approval_rule_level
+                         WHERE rule_id = r.rule_id
+                      ) l
+                     WHERE l.idx <= r.approval_level
+                  ORDER BY l.idx DESC
+                     LIMIT 1
+                   ) lvl ON r.state = 'submitted'
+             WHERE r.submit_date IS NOT NULL
+            """
+        )
+
+    def _read_group_select(self, aggregate_spec, query):
+        """Ulush va persentillar har qanday guruhlash uchun so'rovlar ustida hisoblanadi.
+
+        Tasdiqlash ulushi = tasdiqlanganlar yig'indisi / qaror qilinganlar yig'indisi,
+        mediana va p95 esa guruhdagi barcha so'rovlar vaqtlari bo'yicha.
+        """
+        fname, __, __ = aggregate_spec.partition(':')
+        if fname == 'approval_rate':
+            return SQL(
+                "COALESCE(100.0 * SUM(%s) / NULLIF(SUM(%s), 0), 0)",
+                SQL.identifier(self._table, 'approved_count'),
+                SQL.identifier(self._table, 'decided_count'),
+            )
+        if fname in ('median_hours', 'p95_hours'):
+            return SQL(
+                "percentile_cont(%s) WITHIN GROUP (ORDER BY %s)",
+                0.5 if fname == 'median_hours' else 0.95,
+                SQL.identifier(self._table, fname),
+            )
+        return super()._read_group_select(aggregate_spec, query)
+
+    def init(self):
+        tools.drop_view_if_exists(self.env.cr, self._table)
+        self.env.cr.execute(SQL("CREATE OR REPLACE VIEW %s AS (%s)", SQL.identifier(self._table), self._query()))
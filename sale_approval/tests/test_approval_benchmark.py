@@ -0,0 +1,112 @@
+import logging
+import time
+from contextlib import contextmanager
+
+from odoo import Command
+from odoo.tests import TransactionCase, tagged
+
+from odoo.addons.sale_approval.models.approval_request import APPROVAL_BATCH_SIZE
+
+_logger = logging.getLogger(__name__)
+
+SMALL, LARGE = 30, 300
+CONFIRM_BUDGET = 40
+SUBMIT_BUDGET = 15
+# Bitta bo'lak (APPROVAL_BATCH_SIZE ta so'rov) tasdiqlash
+APPROVE_CHUNK_BUDGET = 80
+# Instant rejimda har bir so'rov uchun alohida xabar
+INSTANT_NOTIFY_BUDGET = 25
+
+
+@tagged('post_install', '-at_install', 'benchmark')
+class TestApprovalBenchmark(TransactionCase):
+    """SQL so'rovlar byudjeti va vaqti; mavjud (populate qilingan) ma'lumotlar ustida ham ishlaydi.
+
+    Mijoz buyurtmalarga oldindan obuna qilinadi, shunda standart ``action_confirm`` ning
+    har bir buyurtma uchun obuna yozuvi byudjetga kirmaydi.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env = cls.env(
+            user=cls.env.ref('base.user_admin'),
+            context=dict(cls.env.context, tracking_disable=True),
+        )
+        partner = cls.env['res.partner'].create({'name': 'Tasdiqlash Benchmark Mijoz', 'is_company': True})
+        product = cls.env['product.product'].create({'name': 'Tasdiqlash Benchmark Mahsulot', 'list_price': 20000.0})
+        orders = cls.env['sale.order'].create([
+            {
+                'partner_id': partner.id,
+                'order_line': [Command.create({
+                    'product_id': product.id,
+                    'product_uom_qty': 1,
+                    'price_unit': 20000.0,
+                })],
+            }
+            for __ in range(2 * (SMALL + LARGE))
+        ])
+        orders.message_subscribe(partner_ids=partner.ids)
+        cls.new_orders = orders[:SMALL + LARGE]
+        request_orders = orders[SMALL + LARGE:]
+        request_orders.action_confirm()
+        cls.requests = request_orders.approval_request_ids
+
+    def _set_mode(self, mode):
+        self.env['ir.config_parameter'].sudo().set_param('sale_approval.manager_notification_mode', mode)
+
+    @contextmanager
+    def _benchmark(self, label):
+        """Blok so'rovlari sonini ``result['queries']`` ga yozish, vaqt bilan logga chiqarish"""
+        self.env.flush_all()
+        self.env.invalidate_all()
+        cr = self.env.cr
+        result = {}
+        start_queries = cr.sql_log_count
+        start = time.perf_counter()
+        yield result
+        self.env.flush_all()
+        result['queries'] = cr.sql_log_count - start_queries
+        _logger.info("%s: %s queries, %.1f ms", label, result['queries'], (time.perf_counter() - start) * 1000)
+
+    def _split(self, records):
+        return records[:SMALL], records[SMALL:SMALL + LARGE]
+
+    def test_confirm_query_count(self):
+        """30 va 300 ta buyurtmaga so'rov yaratish bir xil byudjetga sig'adi"""
+        for orders in self._split(self.new_orders):
+            with self._benchmark(f"action_confirm of {len(orders)} orders") as result:
+                orders.action_confirm()
+            self.assertLessEqual(result['queries'], CONFIRM_BUDGET)
+            self.assertEqual(len(orders.approval_request_ids), len(orders))
+
+    def test_submit_digest_query_count(self):
+        self._set_mode('digest')
+        for requests in self._split(self.requests):
+            with self._benchmark(f"action_submit of {len(requests)} requests (digest)") as result:
+                requests.action_submit()
+            self.assertLessEqual(result['queries'], SUBMIT_BUDGET)
+
+    def test_submit_instant_query_count(self):
+        """Instant rejimda xabarlar sababli so'rovlar soni so'rovlar soniga chiziqli"""
+        self._set_mode('instant')
+        small, large = self._split(self.requests)
+        with self._benchmark(f"action_submit of {len(small)} requests (instant)") as small_result:
+            small.action_submit()
+        with self._benchmark(f"action_submit of {len(large)} requests (instant)") as large_result:
+            large.action_submit()
+        self.assertLessEqual(small_result['queries'], SUBMIT_BUDGET + len(small) * INSTANT_NOTIFY_BUDGET)
+        self.assertLessEqual(large_result['queries'], SUBMIT_BUDGET + len(large) * INSTANT_NOTIFY_BUDGET)
+        self.assertEqual(set(self.requests[:SMALL + LARGE].mapped('manager_notified')), {True})
+
+    def test_approve_query_count(self):
+        """Har bir bo'lak bir xil byudjetga sig'adi"""
+        self._set_mode('instant')
+        self.requests.action_submit()
+        for requests in self._split(self.requests):
+            chunks = -(-len(requests) // APPROVAL_BATCH_SIZE)
+            with self._benchmark(f"action_approve of {len(requests)} requests") as result:
+                requests.action_approve()
+            self.assertLessEqual(result['queries'], chunks * APPROVE_CHUNK_BUDGET)
+            self.assertEqual(set(requests.mapped('state')), {'approved'})
+            self.assertEqual(set(requests.sale_order_id.mapped('state')), {'sale'})